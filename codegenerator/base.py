@@ -12,53 +12,301 @@
 #
 
 import abc
+from concurrent import futures
 import logging
 from pathlib import Path
 import subprocess
-import mdformat as md
+import tempfile
+import time
+from typing import Any
+from typing import TYPE_CHECKING
 
-from jinja2 import Environment
-from jinja2 import FileSystemLoader
-from jinja2 import select_autoescape
-from jinja2 import StrictUndefined
+from codegenerator import output
+from codegenerator import profiling
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
 
 
 def wrap_markdown(input: str, width: int = 79) -> str:
     """Apply mardownify to wrap the markdown"""
+    import mdformat as md
+
     return md.text(input, options={"wrap": width})
 
 
-class BaseGenerator:
-    def __init__(self):
-        # Lower debug level of mdformat
-        logging.getLogger("markdown_it").setLevel(logging.INFO)
+#: Supported modes of formatting generated code
+FORMAT_MODES = ["per-file", "batched", "none"]
+#: Supported ways of passing the generated code to the formatter: files in
+#: the staging directory, stdin/stdout of the formatter process or the
+#: formatter API in-process (stdin is used when API is not supported). `auto`
+#: uses stdin for the per-file formatting and files for the batched one.
+FORMAT_BACKENDS = ["auto", "files", "stdin", "api"]
+
+
+#: Jinja environment class recording the used templates (created on first
+#: use, since jinja2 is only needed once something is rendered)
+_tracking_environment_class: Any = None
+
+
+def get_tracking_environment_class() -> type["Environment"]:
+    """Get Jinja environment class recording templates used while rendering
+
+    Templates included or imported by the rendered template are loaded with
+    `get_template` on every render, therefore recording them gives the
+    partials actually used for the generated file.
+    """
+    global _tracking_environment_class
+    if _tracking_environment_class is None:
+        from jinja2 import Environment
+
+        class TrackingEnvironment(Environment):
+            """Jinja environment recording templates used while rendering"""
 
-        self.env = Environment(
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                #: Names of the loaded templates (only recorded when set)
+                self.loaded: set[str] | None = None
+
+            def get_template(self, name, parent=None, globals=None):
+                if self.loaded is not None and isinstance(name, str):
+                    self.loaded.add(
+                        self.join_path(name, parent) if parent else name
+                    )
+                return super().get_template(name, parent, globals)
+
+        _tracking_environment_class = TrackingEnvironment
+    return _tracking_environment_class
+
+
+def __getattr__(name: str) -> Any:
+    # `TrackingEnvironment` is created lazily to avoid importing jinja2
+    if name == "TrackingEnvironment":
+        return get_tracking_environment_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+#: Jinja environments shared by all generators (by the bytecode cache dir)
+_environments: dict[str | None, Any] = {}
+
+
+def get_environment(bytecode_cache_dir: str | None = None) -> Any:
+    """Get Jinja environment shared by all generators
+
+    Compiled templates are stored in the bytecode cache so that they are not
+    compiled again on every run.
+
+    :param bytecode_cache_dir: Directory of the compiled templates cache.
+        Default temporary directory of the user is used when not set.
+    """
+    if bytecode_cache_dir not in _environments:
+        from jinja2 import FileSystemBytecodeCache
+        from jinja2 import FileSystemLoader
+        from jinja2 import select_autoescape
+        from jinja2 import StrictUndefined
+
+        if bytecode_cache_dir:
+            Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+        env = get_tracking_environment_class()(
             loader=FileSystemLoader("codegenerator/templates"),
             autoescape=select_autoescape(),
             undefined=StrictUndefined,
+            bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir),
         )
-        self.env.filters["wrap_markdown"] = wrap_markdown
+        env.filters["wrap_markdown"] = wrap_markdown
+        _environments[bytecode_cache_dir] = env
+    return _environments[bytecode_cache_dir]
+
+
+class BaseGenerator:
+    #: Formatter command. Paths of the files to format are appended to it
+    format_command: list[str] = ["black", "-l", "79"]
+    #: Formatter command reading code from stdin and writing to stdout
+    format_stdin_command: list[str] = ["black", "-q", "-l", "79", "-"]
+    #: Whether formatter can be used in-process (`_format_content_api`)
+    format_api_supported: bool = True
+    #: Maximal number of files passed to a single formatter invocation
+    format_batch_size: int = 200
+    #: Directory of the compiled templates cache
+    template_cache_dir: str | None = None
+    #: Whether all files of the generator are written through the output
+    #: sink (required by the check mode)
+    output_sink_supported: bool = True
+
+    def __init__(self):
+        #: Formatting mode (one of `FORMAT_MODES`)
+        self.format_mode: str = "per-file"
+        #: Formatting backend (one of `FORMAT_BACKENDS`)
+        self.format_backend: str = "auto"
+        #: Files waiting for the batched formatting
+        self.format_queue: list[Path] = []
+        #: Total time spent in the formatter
+        self.format_time: float = 0.0
+        #: Files written by the generator
+        self.rendered_files: list[Path] = []
+        #: Templates (including partials) used to render the files
+        self.rendered_templates: dict[Path, list[str]] = {}
+        #: Sink of the generated files
+        self.output = output.OutputSink()
+        #: Parsed schema models shared with other generators (see
+        #: `model.JsonSchemaParser`)
+        self.parse_cache: dict | None = None
+        #: Converted models shared with other generators (see
+        #: `common.rust.ConversionCache`)
+        self.conversion_cache: Any = None
+        #: Number of the models converted and reused from the conversion
+        #: cache
+        self.conversion_stats: dict[str, int] = {"converted": 0, "reused": 0}
+
+        # Lower debug level of mdformat
+        logging.getLogger("markdown_it").setLevel(logging.INFO)
+
+    @property
+    def env(self) -> Any:
+        """Jinja environment (created on first use)"""
+        return get_environment(self.template_cache_dir)
 
     def get_parser(self, parser):
         return parser
 
+    @profiling.timed("render")
     def _render(self, template, context, dest, fname):
         """Render single template"""
-        template = self.env.get_template(template)
-        content = template.render(**context)
-        dest.mkdir(parents=True, exist_ok=True)
-        with open(Path(dest, fname), "w") as fp:
-            logging.debug(f"Writing {fp.name}")
-            fp.write(content)
+        env = self.env
+        env.loaded = set()
+        try:
+            content = env.get_template(template).render(**context)
+            templates = sorted(env.loaded)
+        finally:
+            env.loaded = None
+        self.rendered_templates[Path(dest, fname)] = templates
+        # File is only written by the output sink once it is formatted
+        self.output.add(Path(dest, fname), content)
+        self.rendered_files.append(Path(dest, fname))
 
     def _format_code(self, *args):
-        """Format code using Black
+        """Format code according to the formatting mode
+
+        In the `batched` mode files are only queued and formatted with
+        `flush_format_queue`.
 
         :param *args: Path to the code to format
         """
+        if self.format_mode == "none":
+            for path in args:
+                for pending in self.output.get_pending(path):
+                    self.output.commit(pending)
+            return
+        if self.format_mode == "batched":
+            self.format_queue.extend(args)
+            return
         for path in args:
-            subprocess.run(["black", "-l", "79", path])
+            self._run_formatter([path])
+
+    @profiling.timed("format")
+    def _run_formatter(self, paths):
+        """Invoke formatter command for the given paths
+
+        Rendered files which are not written yet are formatted in a staging
+        directory and then committed into the output. Other paths (i.e.
+        directories with files written directly) are formatted in place.
+        """
+        start = time.monotonic()
+        pending: list[Path] = []
+        others: list = []
+        for path in paths:
+            files = self.output.get_pending(path)
+            if files:
+                pending.extend(files)
+            else:
+                others.append(path)
+        pending = list(dict.fromkeys(pending))
+        backend = self.format_backend
+        if backend == "auto":
+            # Staging the files only pays off when a single formatter
+            # invocation formats many of them
+            backend = "files" if self.format_mode == "batched" else "stdin"
+        if pending and backend != "files":
+            self._format_pending(pending)
+        elif pending:
+            with tempfile.TemporaryDirectory() as tmp:
+                staged: list[Path] = []
+                for idx, path in enumerate(pending):
+                    # Every file gets own directory to keep the name
+                    stage = Path(tmp, str(idx), path.name)
+                    stage.parent.mkdir()
+                    stage.write_text(self.output.pending[path])
+                    staged.append(stage)
+                self._invoke_formatter(staged)
+                for path, stage in zip(pending, staged):
+                    self.output.commit(path, stage.read_text())
+        if others and not self.output.dry_run:
+            self._invoke_formatter(others)
+        self.format_time += time.monotonic() - start
+
+    def _format_pending(self, paths: list[Path]):
+        """Format pending files in memory and commit them into the output
+
+        Every file is passed through the stdin of the own formatter process
+        (processes are running concurrently) or formatted in-process.
+        """
+        contents = [self.output.pending[x] for x in paths]
+        if self.format_backend == "api" and self.format_api_supported:
+            contents = [self._format_content_api(x) for x in contents]
+        else:
+            with futures.ThreadPoolExecutor() as executor:
+                contents = list(executor.map(self._format_content, contents))
+        for path, content in zip(paths, contents):
+            self.output.commit(path, content)
+
+    def _format_content(self, content: str) -> str:
+        """Format code using stdin/stdout of the formatter
+
+        :returns: formatted code or the original one when formatter fails
+        """
+        proc = subprocess.run(
+            self.format_stdin_command,
+            input=content,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        if proc.returncode != 0:
+            return content
+        return proc.stdout
+
+    def _format_content_api(self, content: str) -> str:
+        """Format code in-process (using black)"""
+        try:
+            import black
+        except ImportError:
+            raise RuntimeError("black is required for the api format backend")
+        try:
+            return black.format_str(content, mode=black.Mode(line_length=79))
+        except black.InvalidInput:
+            logging.exception("Cannot format generated code")
+            return content
+
+    def _invoke_formatter(self, paths: list):
+        """Run formatter command in batches of `format_batch_size` paths"""
+        for idx in range(0, len(paths), self.format_batch_size):
+            subprocess.run(
+                [
+                    *self.format_command,
+                    *paths[idx : idx + self.format_batch_size],
+                ]
+            )
+
+    def flush_format_queue(self):
+        """Format all queued files and write all pending files
+
+        Files are formatted with as few invocations as possible.
+        """
+        # Same file may be queued multiple times
+        paths = list(dict.fromkeys(self.format_queue))
+        self.format_queue = []
+        if paths:
+            self._run_formatter(paths)
+        self.output.commit_all()
 
     @abc.abstractmethod
     def generate(
@@ -0,0 +1,231 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Any
+from typing import Iterable
+
+from codegenerator import model
+
+#: Directory with the sources of the generator package
+PACKAGE_DIR = Path(__file__).parent
+#: Directory of the templates
+TEMPLATES_DIR = PACKAGE_DIR / "templates"
+
+
+def get_file_hash(path: str | Path) -> str | None:
+    """Calculate hash of the file content
+
+    :returns: hex digest or `None` if file does not exist
+    """
+    try:
+        with open(path, "rb") as fp:
+            return hashlib.md5(fp.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def get_sources_hash(paths: list[Path]) -> str:
+    """Calculate combined hash of the files (i.e. templates)"""
+    dh = hashlib.md5()
+    for path in sorted(paths):
+        dh.update(path.as_posix().encode())
+        dh.update((get_file_hash(path) or "").encode())
+    return dh.hexdigest()
+
+
+def get_generator_sources_hash() -> str:
+    """Calculate hash of the generator code
+
+    Every change of the generator itself must invalidate cached results.
+    Templates are tracked by the cache entries individually.
+    """
+    paths = list(PACKAGE_DIR.glob("*.py"))
+    paths.extend(PACKAGE_DIR.glob("common/*.py"))
+    return get_sources_hash(paths)
+
+
+def get_operation_fingerprint(openapi_spec, operation_id: str) -> str:
+    """Calculate hash of the resolved operation specification"""
+    (path, method, spec) = openapi_spec.get_operation(operation_id)
+    return model.dicthash_(
+        {
+            "path": path,
+            "method": method,
+            "parameters": openapi_spec["paths"][path].get("parameters", []),
+            "operation": spec,
+        }
+    )
+
+
+class GenerationCache:
+    """Content addressed cache of the generated operations
+
+    Cache entry is addressed by the hash of all inputs of the operation
+    generation (resolved operation spec, target parameters and generator
+    sources). It records modules produced by the operation together with
+    hashes of the written files and of the templates rendered for it. Entry
+    is only used when all of the files are still present with the same
+    content and none of the templates has been modified, so that editing a
+    template only invalidates operations using it.
+
+    :param path: Path of the persisted cache. Cache is only kept in memory
+        when not set.
+    """
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        #: Entries waiting for the output files being finalized
+        self.pending: dict[str, dict] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        #: Hashes of the templates of the current run
+        self.template_hashes: dict[str, str | None] = {}
+        if path and path.exists():
+            try:
+                with open(path) as fp:
+                    self.entries = json.load(fp)
+            except ValueError:
+                logging.warning("Ignoring broken generation cache %s", path)
+
+    def get_key(
+        self,
+        target: str,
+        work_dir: str,
+        operation_fingerprint: str,
+        args: Any,
+        sources_hash: str,
+        format_mode: str,
+        format_backend: str,
+    ) -> str:
+        """Build cache key of the operation"""
+        return model.dicthash_(
+            {
+                "target": target,
+                "work_dir": work_dir,
+                "operation": operation_fingerprint,
+                "args": args.model_dump(mode="json"),
+                "sources": sources_hash,
+                "format_mode": format_mode,
+                "format_backend": format_backend,
+            }
+        )
+
+    def get(self, key: str) -> list[tuple] | None:
+        """Get generated modules for the cache key
+
+        :returns: list of (mod_path, mod_name, path) or `None` on cache miss
+        """
+        entry = self.entries.get(key)
+        if (
+            entry is not None
+            and all(
+                self.get_template_hash(name) == hash_
+                for name, hash_ in entry["templates"].items()
+            )
+            and all(
+                get_file_hash(path) == hash_
+                for path, hash_ in entry["files"].items()
+            )
+        ):
+            self.hits += 1
+            return [tuple(x) for x in entry["mods"]]
+        self.misses += 1
+        return None
+
+    def get_rendered_templates(self, key: str) -> dict[Path, list[str]]:
+        """Get templates used to render the files of the cache entry"""
+        entry = self.entries.get(key) or {}
+        return {
+            Path(path): templates
+            for path, templates in entry.get("outputs", {}).items()
+        }
+
+    def get_template_hash(self, name: str) -> str | None:
+        """Get hash of the template (calculated once per run)"""
+        if name not in self.template_hashes:
+            self.template_hashes[name] = get_file_hash(TEMPLATES_DIR / name)
+        return self.template_hashes[name]
+
+    def set(
+        self,
+        key: str,
+        mods: list[tuple],
+        files: list[Path],
+        templates: dict[Path, list[str]],
+    ):
+        """Register results of the operation generation
+
+        Hashes of the files are only calculated in `save` since files may
+        still be changed by the formatter.
+
+        :param templates: Templates (including partials) used to render
+            every file of the operation
+        """
+        self.pending[key] = {
+            "mods": mods,
+            "files": [Path(x).as_posix() for x in files],
+            "templates": {
+                name: self.get_template_hash(name)
+                for name in sorted(
+                    {name for names in templates.values() for name in names}
+                )
+            },
+            "outputs": {
+                Path(path).as_posix(): names
+                for path, names in templates.items()
+            },
+        }
+
+    def discard(self, files: Iterable[Path]):
+        """Do not record results of the operations producing the files
+
+        Used in the check mode for the files which differ from the existing
+        ones, since hashes of the existing files are recorded in `save`.
+        """
+        paths = {x.as_posix() for x in files}
+        self.pending = {
+            key: data
+            for key, data in self.pending.items()
+            if not paths.intersection(data["files"])
+        }
+
+    def save(self):
+        """Persist cache
+
+        Templates may be modified before the next run (i.e. in the watch
+        mode), therefore their hashes are calculated again after saving.
+        """
+        for key, data in self.pending.items():
+            self.entries[key] = {
+                "mods": data["mods"],
+                "files": {x: get_file_hash(x) for x in data["files"]},
+                "templates": data["templates"],
+                "outputs": data["outputs"],
+            }
+        self.pending = {}
+        self.template_hashes = {}
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write into temporary file first to never leave broken cache
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.path.parent, delete=False
+        ) as fp:
+            json.dump(self.entries, fp)
+        os.replace(fp.name, self.path)
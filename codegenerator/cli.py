@@ -12,6 +12,9 @@
 #
 
 import argparse
+from concurrent import futures
+import contextlib
+import cProfile
 import importlib
 import importlib.util
 import inspect
@@ -19,21 +22,52 @@ import logging
 from pathlib import Path
 import re
 import sys
+import time
+from typing import Callable
+from typing import Iterable
+from typing import NamedTuple
 
-from openstack import resource
-from sphinx import pycode
 import yaml
 
-# from codegenerator.ansible import AnsibleGenerator
+from codegenerator import base
+from codegenerator import cache
 from codegenerator import common
-from codegenerator.jsonschema import JsonSchemaGenerator
-from codegenerator.metadata import MetadataGenerator
-from codegenerator.openapi_spec import OpenApiSchemaGenerator
-
-# from codegenerator.osc import OSCGenerator
-from codegenerator.rust_cli import RustCliGenerator
-from codegenerator.rust_sdk import RustSdkGenerator
+from codegenerator import manifest
+from codegenerator import model
+from codegenerator import output
+from codegenerator import profiling
+from codegenerator.base import BaseGenerator
+from codegenerator.base import FORMAT_BACKENDS
+from codegenerator.base import FORMAT_MODES
+from codegenerator.common import rust as common_rust
 from codegenerator.types import Metadata
+from codegenerator.types import OperationTargetParams
+
+#: Code generators for the supported targets as "module:class". Modules are
+#: only imported when the target is selected.
+GENERATORS: dict[str, str] = {
+    # "osc": "codegenerator.osc:OSCGenerator",
+    # "ansible": "codegenerator.ansible:AnsibleGenerator",
+    "rust-sdk": "codegenerator.rust_sdk:RustSdkGenerator",
+    "rust-cli": "codegenerator.rust_cli:RustCliGenerator",
+    "openapi-spec": "codegenerator.openapi_spec:OpenApiSchemaGenerator",
+    "jsonschema": "codegenerator.jsonschema:JsonSchemaGenerator",
+    "metadata": "codegenerator.metadata:MetadataGenerator",
+}
+
+#: Choices of the target argument
+TARGETS = [
+    "osc",
+    "ansible",
+    "rust-sdk",
+    "rust-cli",
+    "openapi-spec",
+    "jsonschema",
+    "metadata",
+]
+
+#: Generators of the process pool worker (Generator, code generator)
+_worker_generators: tuple | None = None
 
 
 class ResourceProcessor:
@@ -101,6 +135,8 @@ class ResourceProcessor:
             self.attrs[k] = {"attr": v, "docs": doc}
 
     def get_attr_docs(self):
+        from sphinx import pycode
+
         mod = pycode.ModuleAnalyzer.for_module(self.mod_name)
         mod.analyze()
         result = {}
@@ -112,6 +148,8 @@ class ResourceProcessor:
         return result
 
     def body_attrs(self):
+        from openstack import resource
+
         for attr in inspect.getmembers(self.resource_class):
             if isinstance(attr[1], resource.Body):
                 yield attr
@@ -120,19 +158,951 @@ class ResourceProcessor:
 class Generator:
     schemas: dict = {}
     metadata: Metadata
+    #: Parsed metadata files
+    metadata_files: dict[str, Metadata] = {}
+    #: Modification time of the loaded specs and metadata files
+    mtimes: dict[str, int] = {}
+    #: Parsed schema objects shared between the operations and targets (see
+    #: `model.JsonSchemaParser.parse_object`)
+    parse_cache: dict[tuple, tuple[list, bytes]] = {}
+    #: Rust types converted from the parsed models shared between the
+    #: operations and microversion variants
+    conversion_cache = common_rust.ConversionCache()
+    #: Directory of the pre-resolved specs cache
+    spec_cache_dir: str | None = None
+    #: Use C-accelerated yaml loader for specs
+    yaml_c_loader: bool = False
+    #: Resolve spec references lazily
+    lazy_refs: bool = False
 
     def get_openapi_spec(self, path: Path):
         logging.debug("Fetch %s", path)
         if path.as_posix() not in self.schemas:
+            self.mtimes[path.as_posix()] = path.stat().st_mtime_ns
             self.schemas[path.as_posix()] = common.get_openapi_spec(
-                path.as_posix()
+                path.as_posix(),
+                cache_dir=self.spec_cache_dir,
+                yaml_c_loader=self.yaml_c_loader,
+                lazy_refs=self.lazy_refs,
             )
         return self.schemas[path.as_posix()]
 
     def load_metadata(self, path: Path):
-        with open(path) as fp:
-            data = yaml.safe_load(fp)
-        self.metadata = Metadata(**data)
+        if path.as_posix() not in self.metadata_files:
+            self.mtimes[path.as_posix()] = path.stat().st_mtime_ns
+            with open(path) as fp:
+                data = yaml.safe_load(fp)
+            self.metadata_files[path.as_posix()] = Metadata(**data)
+        self.metadata = self.metadata_files[path.as_posix()]
+
+    def drop_changed(self) -> list[str]:
+        """Forget loaded specs and metadata whose files have been modified
+
+        :returns: Paths of the dropped files
+        """
+        changed = []
+        for path, mtime in list(self.mtimes.items()):
+            try:
+                current: int | None = Path(path).stat().st_mtime_ns
+            except FileNotFoundError:
+                current = None
+            if current != mtime:
+                changed.append(path)
+                self.mtimes.pop(path)
+                self.schemas.pop(path, None)
+                self.metadata_files.pop(path, None)
+        if changed:
+            # Models of the modified schemas are never requested again
+            self.parse_cache.clear()
+            self.conversion_cache.entries.clear()
+        return changed
+
+
+class OperationResult(NamedTuple):
+    """Result of the single metadata operation generation"""
+
+    #: Generated modules as (mod_path, mod_name, path) tuples
+    mods: list[tuple]
+    #: Files written for the operation
+    files: list[Path]
+    #: Files queued for the batched formatting
+    format_queue: list[Path]
+    #: Time spent in the formatter
+    format_time: float
+    #: Rendered content of the files not written yet
+    pending: dict[Path, str]
+    #: Number of the written files by the status (see `OutputSink`)
+    output_stats: dict[str, int]
+    #: Templates (including partials) used to render every file
+    templates: dict[Path, list[str]]
+    #: Differences from the existing files (see `OutputSink.dry_run`)
+    output_diffs: dict[Path, str]
+    #: Number of the models converted and reused from the conversion cache
+    conversion_stats: dict[str, int]
+
+
+class OperationRecord(NamedTuple):
+    """Inputs and results of the operation generated by the previous run"""
+
+    #: Resolved spec file of the operation
+    spec: Path
+    #: Fingerprint of the resolved operation spec
+    spec_hash: str
+    #: Hash of the operation target parameters (metadata entry)
+    args_hash: str
+    #: Templates (including partials) used to render every file
+    templates: dict[Path, list[str]]
+    #: Generated modules as (mod_path, mod_name, path) tuples
+    mods: list[tuple]
+
+
+class OperationGraph:
+    """Dependencies of the operations generated by the previous run
+
+    Every operation depends on the resolved spec of the operation, its
+    metadata entry and the templates rendered for it (the same data is
+    recorded in the manifest). Operations whose inputs are not among the
+    changed paths are taken over from the previous run without being
+    fingerprinted, looked up in the generation cache or rendered.
+    """
+
+    def __init__(self):
+        #: Operations by (service, res, operation_id, target)
+        self.operations: dict[tuple, OperationRecord] = {}
+        #: Hash of the generator sources the operations were generated with
+        self.sources_hash: str | None = None
+        #: Resolved paths modified since the previous run
+        self.changed: set[Path] = set()
+
+    def get_unchanged(
+        self, task: tuple, get_fingerprint: Callable[[Path, str], str]
+    ) -> OperationRecord | None:
+        """Get record of the task when none of its inputs changed
+
+        :param get_fingerprint: Function calculating fingerprint of the
+            operation spec (only called when the spec file changed)
+        """
+        (service, res, spec_path, operation_id, target, op_args) = task
+        record = self.operations.get((service, res, operation_id, target))
+        if record is None or record.spec != spec_path:
+            return None
+        if record.args_hash != model.dicthash_(
+            op_args.model_dump(mode="json")
+        ):
+            return None
+        if any(
+            Path(cache.TEMPLATES_DIR, name).resolve() in self.changed
+            for names in record.templates.values()
+            for name in names
+        ):
+            return None
+        if (
+            spec_path in self.changed
+            and get_fingerprint(spec_path, operation_id) != record.spec_hash
+        ):
+            return None
+        return record
+
+
+def generate_operation(
+    generator: Generator,
+    code_generators: dict[str, BaseGenerator],
+    res: str,
+    work_dir: str,
+    spec_path: Path,
+    operation_id: str,
+    targets: list[tuple[str, OperationTargetParams]],
+) -> list[OperationResult]:
+    """Generate code for the single metadata operation
+
+    Code for all requested targets is generated at once. Parsed models are
+    shared between the targets and the operations of the run. Files queued
+    for the batched formatting are handed over with the result so that
+    formatting can be done by the main process.
+
+    :param targets: List of (target, op_args) to generate the operation for
+    :returns: Results of every target in the order of `targets`
+    """
+    openapi_spec = generator.get_openapi_spec(spec_path)
+    results: list[OperationResult] = []
+    for target, op_args in targets:
+        code_generator = code_generators[target]
+        format_time = code_generator.format_time
+        code_generator.rendered_files = []
+        code_generator.parse_cache = generator.parse_cache
+        conversion_cache = generator.conversion_cache
+        code_generator.conversion_cache = conversion_cache
+        (converted, reused) = (
+            conversion_cache.converted,
+            conversion_cache.reused,
+        )
+        output_stats = code_generator.output.stats
+        code_generator.output.stats = dict.fromkeys(output_stats, 0)
+        output_diffs = code_generator.output.diffs
+        code_generator.output.diffs = {}
+        try:
+            with profiling.operation(f"{target} {operation_id}"):
+                mods = list(
+                    code_generator.generate(
+                        res,
+                        work_dir,
+                        openapi_spec=openapi_spec,
+                        operation_id=operation_id,
+                        args=op_args,
+                    )
+                )
+        finally:
+            code_generator.parse_cache = None
+            code_generator.conversion_cache = None
+        format_queue = code_generator.format_queue
+        code_generator.format_queue = []
+        pending = code_generator.output.pending
+        code_generator.output.pending = {}
+        (output_stats, code_generator.output.stats) = (
+            code_generator.output.stats,
+            output_stats,
+        )
+        (output_diffs, code_generator.output.diffs) = (
+            code_generator.output.diffs,
+            output_diffs,
+        )
+        results.append(
+            OperationResult(
+                mods,
+                code_generator.rendered_files,
+                format_queue,
+                code_generator.format_time - format_time,
+                pending,
+                output_stats,
+                {
+                    path: code_generator.rendered_templates[path]
+                    for path in code_generator.rendered_files
+                },
+                output_diffs,
+                {
+                    "converted": conversion_cache.converted - converted,
+                    "reused": conversion_cache.reused - reused,
+                },
+            )
+        )
+    return results
+
+
+def _init_worker(args: argparse.Namespace):
+    """Initialize generators of the process pool worker"""
+    global _worker_generators
+    _worker_generators = (
+        get_generator(args),
+        {target: get_code_generator(target, args) for target in args.target},
+    )
+
+
+def get_generator(args: argparse.Namespace) -> Generator:
+    """Get generator configured according to the arguments"""
+    generator = Generator()
+    generator.spec_cache_dir = args.cache_dir
+    generator.yaml_c_loader = args.yaml_c_loader
+    generator.lazy_refs = args.lazy_refs
+    return generator
+
+
+def get_generator_class(target: str) -> Callable[[], BaseGenerator]:
+    """Import code generator class of the target"""
+    (module_name, class_name) = GENERATORS[target].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_code_generator(target: str, args: argparse.Namespace):
+    """Get code generator of the target configured with the arguments"""
+    code_generator = get_generator_class(target)()
+    configure_code_generator(code_generator, args)
+    return code_generator
+
+
+def configure_code_generator(
+    code_generator: BaseGenerator, args: argparse.Namespace
+):
+    """Configure code generator according to the arguments"""
+    if args.check and not code_generator.output_sink_supported:
+        raise RuntimeError(
+            f"{type(code_generator).__name__} writes files directly and "
+            "does not support --check"
+        )
+    code_generator.format_mode = args.format_mode
+    code_generator.format_backend = args.format_backend
+    code_generator.output.dry_run = args.check
+    if args.cache_dir:
+        code_generator.template_cache_dir = Path(
+            args.cache_dir, "templates"
+        ).as_posix()
+
+
+def _generate_operation_worker(
+    res: str,
+    work_dir: str,
+    spec_path: Path,
+    operation_id: str,
+    targets: list[tuple[str, OperationTargetParams]],
+) -> tuple[list[OperationResult], dict | None]:
+    """Generate single metadata operation inside of the pool worker
+
+    :returns: Operation results and timings collected while generating
+        them when profiling is enabled
+    """
+    if not _worker_generators:
+        raise RuntimeError("Process pool worker is not initialized")
+    generator, code_generators = _worker_generators
+    # Every task reports only own timings to the main process
+    profiler = profiling.enable() if profiling.get_profiler() else None
+    results = generate_operation(
+        generator,
+        code_generators,
+        res,
+        work_dir,
+        spec_path,
+        operation_id,
+        targets,
+    )
+    return (results, profiler.get_data() if profiler else None)
+
+
+def reset_code_generators(code_generators: dict[str, BaseGenerator]):
+    """Reset state of the code generators before next run
+
+    Leftovers of the failed run must not leak into the next one.
+    """
+    for code_generator in code_generators.values():
+        code_generator.output.pending = {}
+        code_generator.output.stats = dict.fromkeys(
+            code_generator.output.stats, 0
+        )
+        code_generator.format_queue = []
+        code_generator.format_time = 0.0
+        code_generator.rendered_templates = {}
+        code_generator.output.diffs = {}
+        code_generator.conversion_stats = dict.fromkeys(
+            code_generator.conversion_stats, 0
+        )
+
+
+def get_requested_metadata_files(
+    args: argparse.Namespace,
+) -> dict[str | None, Path]:
+    """Get metadata files to be generated according to the arguments"""
+    if args.metadata_dir:
+        return get_metadata_files(
+            Path(args.metadata_dir),
+            args.service.split(",") if args.service else None,
+        )
+    return {args.service: Path(args.metadata)}
+
+
+def get_metadata_files(
+    metadata_dir: Path, services: list[str] | None = None
+) -> dict[str | None, Path]:
+    """Discover metadata files of all services in the directory
+
+    :param services: Only return metadata files of these services
+    :returns: Metadata files by the service name
+    """
+    suffix = "_metadata.yaml"
+    return {
+        path.name[: -len(suffix)]: path
+        for path in sorted(metadata_dir.glob(f"*{suffix}"))
+        if services is None or path.name[: -len(suffix)] in services
+    }
+
+
+@contextlib.contextmanager
+def _timed(timings: dict[str, float], phase: str):
+    """Add time spent in the block to the timings of the phase"""
+    start = time.monotonic()
+    try:
+        with profiling.phase(f"run.{phase}"):
+            yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.monotonic() - start
+
+
+def generate_metadata(
+    args: argparse.Namespace,
+    generator: Generator,
+    code_generators: dict[str, BaseGenerator],
+    metadata_files: dict[str | None, Path],
+    generation_caches: dict[str, cache.GenerationCache] | None = None,
+    graph: OperationGraph | None = None,
+):
+    """Generate code for the operations described in the metadata files
+
+    Operations of all services are generated in the same (process pool)
+    run so that specs, templates and formatting are shared between them.
+
+    :param metadata_files: Metadata files by the service name (used as a
+        resources filter when set)
+    :param generation_caches: Generation caches by the target kept between
+        the runs (i.e. in the watch mode). Caches of the `--cache-dir` are
+        used when not given.
+    :param graph: Dependencies of the operations of the previous run. Only
+        operations affected by its changed paths are generated and the graph
+        is updated with the results of the run.
+    """
+    start = time.monotonic()
+    timings: dict[str, float] = {}
+    # Operations to be generated as (service, res, spec_path, operation_id,
+    # target, op_args)
+    tasks: list[tuple] = []
+    # Ordered layout of the resulting mod_paths per service and target.
+    # Every entry is either an index of the task or an explicit mod_path
+    # tuple. It is used to merge the results deterministically independent
+    # of the order the tasks are completed.
+    res_mods_layout: dict[tuple, list[int | tuple]] = {}
+    # Last processed resource of the service
+    last_resources: dict[str | None, str] = {}
+
+    with _timed(timings, "metadata"):
+        for service, metadata_path in metadata_files.items():
+            generator.load_metadata(metadata_path)
+            for target in args.target:
+                res_mods_layout[(service, target)] = []
+            for res, res_data in generator.metadata.resources.items():
+                last_resources[service] = res
+                if service and not res.startswith(service):
+                    continue
+                if args.resource and res != f"{service}.{args.resource}":
+                    continue
+                for op, op_data in res_data.operations.items():
+                    logging.debug(
+                        f"Processing operation {op_data.operation_id}"
+                    )
+                    for target in args.target:
+                        if target not in op_data.targets:
+                            continue
+                        op_args = op_data.targets[target]
+                        if not op_args.service_type:
+                            op_args.service_type = res.split(".")[0]
+                        if not op_args.api_version:
+                            op_args.api_version = res_data.api_version
+                        if (
+                            not op_args.operation_type
+                            and op_data.operation_type
+                        ):
+                            op_args.operation_type = op_data.operation_type
+                        # if not op_data.alternative_module_name and args.target == "rust-sdk":
+
+                        spec_path = Path(
+                            # metadata_path.parent,
+                            op_data.spec_file or res_data.spec_file
+                        ).resolve()
+                        res_mods_layout[(service, target)].append(len(tasks))
+                        tasks.append(
+                            (
+                                service,
+                                res,
+                                spec_path,
+                                op_data.operation_id,
+                                target,
+                                op_args,
+                            )
+                        )
+                rust_sdk_extensions = res_data.extensions.get("rust-sdk")
+                if rust_sdk_extensions and "rust-sdk" in args.target:
+                    additional_modules = rust_sdk_extensions.setdefault(
+                        "additional_modules", []
+                    )
+                    res_x = res.split(".")
+                    for mod in additional_modules:
+                        res_mods_layout[(service, "rust-sdk")].append(
+                            (
+                                [
+                                    res_x[0].replace("-", "_"),
+                                    res_data.api_version,
+                                    res_x[1],
+                                ],
+                                mod,
+                                "",
+                            )
+                        )
+
+    with _timed(timings, "specs"):
+        for spec_path in {task[2] for task in tasks}:
+            generator.get_openapi_spec(spec_path)
+
+    # Fingerprints of the resolved operation specs (before the generators
+    # touch them)
+    fingerprints: dict[tuple, str] = {}
+
+    def get_fingerprint(spec_path: Path, operation_id: str) -> str:
+        if (spec_path, operation_id) not in fingerprints:
+            fingerprints[(spec_path, operation_id)] = (
+                cache.get_operation_fingerprint(
+                    generator.get_openapi_spec(spec_path), operation_id
+                )
+            )
+        return fingerprints[(spec_path, operation_id)]
+
+    # Generated modules of the tasks
+    results: dict[int, list[tuple]] = {}
+    # Templates used to render the files of the tasks
+    task_templates: dict[int, dict[Path, list[str]]] = {}
+    sources_hash = cache.get_generator_sources_hash()
+    if graph is not None and graph.sources_hash != sources_hash:
+        graph.operations = {}
+    with _timed(timings, "fingerprints"):
+        for idx, task in enumerate(tasks):
+            (_, _, spec_path, operation_id, target, _) = task
+            operation_record = (
+                graph.get_unchanged(task, get_fingerprint) if graph else None
+            )
+            if operation_record:
+                fingerprints.setdefault(
+                    (spec_path, operation_id), operation_record.spec_hash
+                )
+                results[idx] = operation_record.mods
+                task_templates[idx] = operation_record.templates
+                code_generators[target].rendered_templates.update(
+                    operation_record.templates
+                )
+            else:
+                get_fingerprint(spec_path, operation_id)
+    if graph is not None and results:
+        logging.info(
+            "%d operation targets are not affected by the modifications",
+            len(results),
+        )
+    if generation_caches is None:
+        generation_caches = {}
+        if args.cache_dir:
+            for target in args.target:
+                generation_caches[target] = cache.GenerationCache(
+                    Path(args.cache_dir, f"generate_{target}.json")
+                )
+    cache_keys: dict[int, str] = {}
+    if generation_caches:
+        with _timed(timings, "cache"):
+            for idx, task in enumerate(tasks):
+                if idx in results:
+                    continue
+                (_, _, spec_path, operation_id, target, op_args) = task
+                cache_keys[idx] = generation_caches[target].get_key(
+                    target,
+                    args.work_dir,
+                    fingerprints[(spec_path, operation_id)],
+                    op_args,
+                    sources_hash,
+                    args.format_mode,
+                    args.format_backend,
+                )
+                cached_mods = generation_caches[target].get(cache_keys[idx])
+                if cached_mods is not None:
+                    results[idx] = cached_mods
+                    task_templates[idx] = generation_caches[
+                        target
+                    ].get_rendered_templates(cache_keys[idx])
+                    code_generators[target].rendered_templates.update(
+                        task_templates[idx]
+                    )
+    # Tasks to be generated grouped by the operation (res, spec_path,
+    # operation_id) so that all targets of the operation are generated
+    # together
+    operations: dict[tuple, list[int]] = {}
+    for idx in range(len(tasks)):
+        if idx not in results:
+            operations.setdefault(tasks[idx][1:4], []).append(idx)
+
+    operation_results: dict[int, OperationResult] = {}
+    with _timed(timings, "generate"):
+        if args.jobs > 1 and len(operations) > 1:
+            # Specs are already loaded in the main process so that forked
+            # workers inherit them instead of parsing them again
+            with futures.ProcessPoolExecutor(
+                max_workers=args.jobs,
+                initializer=_init_worker,
+                initargs=(args,),
+            ) as executor:
+                pending = [
+                    (
+                        idxs,
+                        executor.submit(
+                            _generate_operation_worker,
+                            op_res,
+                            args.work_dir,
+                            spec_path,
+                            operation_id,
+                            [tasks[idx][4:6] for idx in idxs],
+                        ),
+                    )
+                    for (op_res, spec_path, operation_id), idxs in (
+                        operations.items()
+                    )
+                ]
+                for idxs, future in pending:
+                    (worker_results, worker_profile) = future.result()
+                    operation_results.update(zip(idxs, worker_results))
+                    profiler = profiling.get_profiler()
+                    if profiler and worker_profile:
+                        profiler.merge(worker_profile)
+        else:
+            for (op_res, spec_path, operation_id), idxs in operations.items():
+                operation_results.update(
+                    zip(
+                        idxs,
+                        generate_operation(
+                            generator,
+                            code_generators,
+                            op_res,
+                            args.work_dir,
+                            spec_path,
+                            operation_id,
+                            [tasks[idx][4:6] for idx in idxs],
+                        ),
+                    )
+                )
+    # Files written per service and target
+    written_files: dict[tuple, int] = {}
+    for idx, operation_result in operation_results.items():
+        service, target = tasks[idx][0], tasks[idx][4]
+        results[idx] = operation_result.mods
+        task_templates[idx] = operation_result.templates
+        written_files[(service, target)] = written_files.get(
+            (service, target), 0
+        ) + len(operation_result.files)
+        code_generators[target].format_queue.extend(
+            operation_result.format_queue
+        )
+        code_generators[target].format_time += operation_result.format_time
+        code_generators[target].output.pending.update(operation_result.pending)
+        code_generators[target].rendered_templates.update(
+            operation_result.templates
+        )
+        for status, count in operation_result.output_stats.items():
+            code_generators[target].output.stats[status] += count
+        code_generators[target].output.diffs.update(
+            operation_result.output_diffs
+        )
+        for name, count in operation_result.conversion_stats.items():
+            code_generators[target].conversion_stats[name] += count
+        if target in generation_caches:
+            generation_caches[target].set(
+                cache_keys[idx],
+                operation_result.mods,
+                operation_result.files,
+                operation_result.templates,
+            )
+
+    # Resulting mod_paths per service and target
+    res_mods: dict[tuple, list[tuple]] = {}
+    # Templates used to render the mod files per service and target
+    mods_templates: dict[tuple, dict[Path, list[str]]] = {}
+    with _timed(timings, "mods"):
+        for (service, target), layout in res_mods_layout.items():
+            code_generator = code_generators[target]
+            mods = res_mods.setdefault((service, target), [])
+            for entry in layout:
+                if isinstance(entry, int):
+                    mods.extend(results[entry])
+                else:
+                    mods.append(entry)
+
+            if target == "rust-sdk" and not args.resource:
+                code_generator.rendered_files = []
+                generate_sdk_mods(
+                    code_generator,
+                    args.work_dir,
+                    mods,
+                    last_resources.get(service, ""),
+                )
+                written_files[(service, target)] = written_files.get(
+                    (service, target), 0
+                ) + len(code_generator.rendered_files)
+                mods_templates[(service, target)] = {
+                    path: code_generator.rendered_templates[path]
+                    for path in code_generator.rendered_files
+                }
+
+    with _timed(timings, "format"):
+        for code_generator in code_generators.values():
+            code_generator.flush_format_queue()
+    for target, code_generator in code_generators.items():
+        log_output_stats(target, code_generator)
+        if any(code_generator.conversion_stats.values()):
+            logging.info(
+                "Type conversion (%s): %d models converted, %d reused",
+                target,
+                code_generator.conversion_stats["converted"],
+                code_generator.conversion_stats["reused"],
+            )
+    with _timed(timings, "manifest"):
+        generated = manifest.Manifest(args.work_dir)
+        generated.generator = sources_hash
+        operation_records: dict[tuple, OperationRecord] = {}
+        for idx, templates in task_templates.items():
+            (service, res, spec_path, operation_id, target, op_args) = tasks[
+                idx
+            ]
+            operation_record = OperationRecord(
+                spec_path,
+                fingerprints[(spec_path, operation_id)],
+                model.dicthash_(op_args.model_dump(mode="json")),
+                templates,
+                results[idx],
+            )
+            operation_records[(service, res, operation_id, target)] = (
+                operation_record
+            )
+            generated.add_outputs(
+                target,
+                templates,
+                metadata=generated.get_relative_path(metadata_files[service]),
+                service=service,
+                resource=res,
+                operation_id=operation_id,
+                spec=generated.get_relative_path(spec_path),
+                spec_hash=operation_record.spec_hash,
+                args_hash=operation_record.args_hash,
+            )
+        if graph is not None:
+            graph.operations = operation_records
+            graph.sources_hash = sources_hash
+        for (service, target), templates in mods_templates.items():
+            generated.add_outputs(
+                target,
+                templates,
+                metadata=generated.get_relative_path(metadata_files[service]),
+                service=service,
+            )
+        stale = write_metadata_manifest(
+            args.manifest or Path(args.work_dir, manifest.MANIFEST_NAME),
+            generated,
+            args,
+            metadata_files,
+        )
+    stale_paths = {
+        generated.get_path(x): record for x, record in stale.items()
+    }
+    if stale and args.check:
+        for path, record in stale_paths.items():
+            with contextlib.suppress(FileNotFoundError):
+                with open(path, "rb") as fp:
+                    code_generators[record["target"]].output.diffs[path] = (
+                        output.unified_diff(path, fp.read(), None)
+                    )
+    elif stale and args.no_prune:
+        logging.warning(
+            "Stale outputs not produced anymore: %s",
+            ", ".join(x.as_posix() for x in stale_paths),
+        )
+    elif stale:
+        with _timed(timings, "prune"):
+            prune_outputs(
+                [x.as_posix() for x in stale_paths],
+                args.work_dir,
+                [generated.get_path(x).as_posix() for x in generated.outputs],
+            )
+        if args.resource and "rust-sdk" in args.target:
+            logging.warning(
+                "Mod files are not regenerated with --resource. Generate "
+                "the whole service to drop pruned modules from them"
+            )
+
+    if generation_caches:
+        with _timed(timings, "cache"):
+            for target, generation_cache in generation_caches.items():
+                generation_cache.discard(code_generators[target].output.diffs)
+                generation_cache.save()
+                logging.info(
+                    "Generation cache (%s): %d hits, %d misses",
+                    target,
+                    generation_cache.hits,
+                    generation_cache.misses,
+                )
+
+    for (service, target), mods in res_mods.items():
+        logging.info(
+            "Generated %d %s modules of %d operations for %s (%d files "
+            "rendered)",
+            len(mods),
+            target,
+            len(
+                [
+                    x
+                    for x in res_mods_layout[(service, target)]
+                    if isinstance(x, int)
+                ]
+            ),
+            service or "all services",
+            written_files.get((service, target), 0),
+        )
+    logging.info(
+        "Generated %d operations for %d targets in %.2fs (%s; total "
+        "formatting: %.2fs)",
+        len({task[1:4] for task in tasks}),
+        len(code_generators),
+        time.monotonic() - start,
+        ", ".join(f"{phase}: {t:.2f}s" for phase, t in timings.items()),
+        sum(x.format_time for x in code_generators.values()),
+    )
+
+
+def report_diffs(code_generators: dict[str, BaseGenerator]) -> int:
+    """Print differences of the generated files from the existing ones
+
+    :returns: Number of the differing files
+    """
+    diffs: dict[Path, str] = {}
+    for code_generator in code_generators.values():
+        diffs.update(code_generator.output.diffs)
+    for path in sorted(diffs):
+        sys.stdout.write(diffs[path])
+    if diffs:
+        logging.error(
+            "%d generated files differ from the work dir: %s",
+            len(diffs),
+            ", ".join(x.as_posix() for x in sorted(diffs)),
+        )
+    else:
+        logging.info("Generated files are up to date")
+    return len(diffs)
+
+
+def log_output_stats(target: str, code_generator: BaseGenerator):
+    """Log statistics of the files written by the code generator"""
+    stats = code_generator.output.stats
+    logging.info(
+        "Output of %s: %d new, %d changed, %d unchanged files",
+        target,
+        stats["new"],
+        stats["changed"],
+        stats["unchanged"],
+    )
+
+
+def write_manifest(
+    path: str, work_dir: str, code_generators: dict[str, BaseGenerator]
+):
+    """Write manifest of the files generated by the code generators"""
+    generated = manifest.Manifest(work_dir)
+    for target, code_generator in code_generators.items():
+        generated.add_outputs(target, code_generator.rendered_templates)
+    generated.add_templates(base.get_environment())
+    generated.write(path)
+    logging.info("Manifest written to %s", path)
+
+
+def write_metadata_manifest(
+    path: str | Path,
+    generated: manifest.Manifest,
+    args: argparse.Namespace,
+    metadata_files: dict[str | None, Path],
+) -> dict[str, dict]:
+    """Write manifest of the metadata run
+
+    Outputs of the previous manifest produced by other runs (other
+    services, targets or resources) are preserved. Manifest is not written
+    in the check mode.
+
+    :returns: Stale outputs of the previous runs in the scope of this run
+        which have not been produced anymore
+    """
+    scope = {
+        (target, generated.get_relative_path(metadata_path), service)
+        for service, metadata_path in metadata_files.items()
+        for target in args.target
+    }
+
+    def owned(output: dict) -> bool:
+        service = output.get("service")
+        return (
+            output["target"],
+            output.get("metadata"),
+            service,
+        ) in scope and (
+            not args.resource
+            or output.get("resource") == f"{service}.{args.resource}"
+        )
+
+    stale = generated.merge(
+        manifest.Manifest.load(path, generated.root),
+        owned,
+        keep_stale=args.no_prune,
+    )
+    if not args.check:
+        generated.add_templates(base.get_environment())
+        generated.write(path)
+        logging.debug("Manifest written to %s", path)
+    return stale
+
+
+def prune_outputs(
+    paths: Iterable[str], work_dir: str, produced: Iterable[str] = ()
+):
+    """Remove stale outputs and directories left empty inside work dir
+
+    :param produced: Outputs of the current run which are never removed
+        (i.e. the same file known under a different path)
+    """
+    root = Path(work_dir).resolve()
+    keep = {Path(x).resolve() for x in produced}
+    for path in map(Path, paths):
+        if root not in path.resolve().parents:
+            logging.warning("Not removing %s outside of work dir", path)
+            continue
+        if path.resolve() in keep:
+            logging.warning("Not removing %s produced by this run", path)
+            continue
+        logging.info("Removing stale %s", path)
+        path.unlink(missing_ok=True)
+        parent = path.parent.resolve()
+        while parent != root and root in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                # Directory is not empty (or does not exist)
+                break
+            parent = parent.parent
+
+
+def generate_sdk_mods(
+    code_generator: BaseGenerator,
+    work_dir: str,
+    res_mods: list[tuple],
+    res: str,
+):
+    """Generate mod files of the rust-sdk modules"""
+    resource_results: dict[str, dict] = {}
+    for mod_path, mod_name, path in res_mods:
+        mn = "/".join(mod_path)
+        x = resource_results.setdefault(mn, {"path": path, "mods": set()})
+        x["mods"].add(mod_name)
+    changed = True
+    while changed:
+        changed = False
+        for mod_path in [
+            mod_path_str.split("/") for mod_path_str in resource_results.keys()
+        ]:
+            if len(mod_path) < 3:
+                continue
+            mn = "/".join(mod_path[0:-1])
+            mod_name = mod_path[-1]
+            if mn in resource_results:
+                if mod_name not in resource_results[mn]["mods"]:
+                    resource_results[mn]["mods"].add(mod_name)
+                    changed = True
+            else:
+                changed = True
+                x = resource_results.setdefault(
+                    mn, {"path": path, "mods": set()}
+                )
+                x["mods"].add(mod_name)
+
+        for path, gen_data in resource_results.items():
+            code_generator.generate_mod(
+                work_dir,
+                path.split("/"),
+                gen_data["mods"],
+                gen_data["path"],
+                res.split(".")[-1].capitalize(),
+                service_name=path.split("/")[0],
+            )
 
 
 def main():
@@ -152,16 +1122,13 @@ def main():
     parser.add_argument(
         "--target",
         required=True,
-        choices=[
-            "osc",
-            "ansible",
-            "rust-sdk",
-            "rust-cli",
-            "openapi-spec",
-            "jsonschema",
-            "metadata",
-        ],
-        help="Target for which to generate code",
+        nargs="+",
+        choices=TARGETS,
+        help=(
+            "Target(s) for which to generate code. Multiple targets are "
+            "generated in a single run sharing the loaded specs and the "
+            "parsed models"
+        ),
     )
     parser.add_argument(
         "--work-dir", help="Working directory for the generated code"
@@ -185,22 +1152,147 @@ def main():
     )
 
     parser.add_argument("--metadata", help=("Metadata file to load"))
-    parser.add_argument("--service", help=("Metadata service name filter"))
+    parser.add_argument(
+        "--metadata-dir",
+        help=(
+            "Directory with the metadata files (<service>_metadata.yaml) "
+            "of all services to be generated in a single run"
+        ),
+    )
+    parser.add_argument(
+        "--service",
+        help=(
+            "Metadata service name filter (comma separated list of services "
+            "with --metadata-dir)"
+        ),
+    )
     parser.add_argument("--resource", help=("Metadata resource name filter"))
     parser.add_argument(
         "--validate",
         action="store_true",
         help=("Metadata resource name filter"),
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Number of parallel processes for the metadata operations "
+            "generation"
+        ),
+    )
+    parser.add_argument(
+        "--format-mode",
+        choices=FORMAT_MODES,
+        default="per-file",
+        help=(
+            "Formatting of the generated code: every file separately, "
+            "all files at once at the end of the run or not at all"
+        ),
+    )
+    parser.add_argument(
+        "--format-backend",
+        choices=FORMAT_BACKENDS,
+        default="auto",
+        help=(
+            "Pass generated code to the formatter as files, through "
+            "stdin/stdout of the formatter or use formatter API in-process "
+            "(where supported). By default stdin is used for the per-file "
+            "formatting and files for the batched formatting"
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        help=(
+            "Directory of the generation cache. Operations with unchanged "
+            "inputs are not generated again and OpenAPI specs with resolved "
+            "references are reused."
+        ),
+    )
+    parser.add_argument(
+        "--yaml-c-loader",
+        action="store_true",
+        help="Use C-accelerated YAML loader (when available) for specs",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help=(
+            "Write timings of the generation phases and operations into "
+            "the JSON file and log them as a table"
+        ),
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="Number of the slowest operations to report with --profile",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="PATH",
+        help="Run the generator under cProfile and dump stats into the file",
+    )
+    parser.add_argument(
+        "--lazy-refs",
+        action="store_true",
+        help="Resolve references of the OpenAPI specs only on access",
+    )
+
+    parser.add_argument(
+        "--manifest",
+        metavar="PATH",
+        help=(
+            "Write manifest of the generated files with templates "
+            "(including partials) used to render them. Metadata runs "
+            "always write it (into the work dir by default)"
+        ),
+    )
+    parser.add_argument(
+        "--no-prune",
+        action="store_true",
+        help=(
+            "Do not remove stale outputs of the operations which are not "
+            "in the metadata anymore (only report them)"
+        ),
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help=(
+            "Do not write anything, only compare generated (and formatted) "
+            "code with the files in the work dir, print unified diffs and "
+            "exit with non-zero code when they differ"
+        ),
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help=(
+            "Keep running and generate metadata on the JSON-lines requests "
+            "received over the Unix socket (or stdin when '-') reusing "
+            "loaded specs, metadata and templates between them"
+        ),
+    )
 
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep watching specs, metadata and templates and regenerate "
+            "operations affected by their modifications"
+        ),
+    )
+
+    # Only generators of the selected targets are instantiated (all of them
+    # when targets are not known, i.e. for the help)
+    target_parser = argparse.ArgumentParser(add_help=False)
+    target_parser.add_argument("--target", nargs="+", choices=TARGETS)
+    (target_args, _) = target_parser.parse_known_args()
     generators = {
-        # "osc": OSCGenerator(),
-        # "ansible": AnsibleGenerator(),
-        "rust-sdk": RustSdkGenerator(),
-        "rust-cli": RustCliGenerator(),
-        "openapi-spec": OpenApiSchemaGenerator(),
-        "jsonschema": JsonSchemaGenerator(),
-        "metadata": MetadataGenerator(),
+        target: get_generator_class(target)()
+        for target in (target_args.target or GENERATORS.keys())
     }
 
     for g, v in generators.items():
@@ -208,119 +1300,80 @@ def main():
 
     args = parser.parse_args()
     logging.basicConfig(level=logging.DEBUG)
-    generator = Generator()
 
-    if args.metadata:
-        metadata_path = Path(args.metadata)
-        generator.load_metadata(metadata_path)
-        # Resulting mod_paths
-        res_mods = []
+    profiler = profiling.enable() if args.profile else None
+    cprofiler = cProfile.Profile() if args.cprofile else None
+    if cprofiler:
+        cprofiler.enable()
+    try:
+        run(args, generators)
+    finally:
+        if cprofiler:
+            cprofiler.disable()
+            cprofiler.dump_stats(args.cprofile)
+            logging.info("cProfile stats written to %s", args.cprofile)
+        if profiler:
+            profiler.write(args.profile, args.profile_top)
+            logging.info(
+                "Profile written to %s\n%s",
+                args.profile,
+                profiler.format_table(args.profile_top),
+            )
 
-        for res, res_data in generator.metadata.resources.items():
-            if args.service and not res.startswith(args.service):
-                continue
-            if args.resource and res != f"{args.service}.{args.resource}":
-                continue
-            for op, op_data in res_data.operations.items():
-                logging.debug(f"Processing operation {op_data.operation_id}")
-                if args.target in op_data.targets:
-                    op_args = op_data.targets[args.target]
-                    if not op_args.service_type:
-                        op_args.service_type = res.split(".")[0]
-                    if not op_args.api_version:
-                        op_args.api_version = res_data.api_version
-                    if not op_args.operation_type and op_data.operation_type:
-                        op_args.operation_type = op_data.operation_type
-                    # if not op_data.alternative_module_name and args.target == "rust-sdk":
-
-                    openapi_spec = generator.get_openapi_spec(
-                        Path(
-                            # metadata_path.parent,
-                            op_data.spec_file or res_data.spec_file
-                        ).resolve()
-                    )
 
-                    for mod_path, mod_name, path in generators[
-                        args.target
-                    ].generate(
-                        res,
-                        args.work_dir,
-                        openapi_spec=openapi_spec,
-                        operation_id=op_data.operation_id,
-                        args=op_args,
-                    ):
-                        res_mods.append((mod_path, mod_name, path))
-            rust_sdk_extensions = res_data.extensions.get("rust-sdk")
-            if rust_sdk_extensions:
-                additional_modules = rust_sdk_extensions.setdefault(
-                    "additional_modules", []
-                )
-                res_x = res.split(".")
-                for mod in additional_modules:
-                    res_mods.append(
-                        (
-                            [
-                                res_x[0].replace("-", "_"),
-                                res_data.api_version,
-                                res_x[1],
-                            ],
-                            mod,
-                            "",
-                        )
-                    )
+def run(args: argparse.Namespace, generators: dict[str, BaseGenerator]):
+    """Run generation according to the arguments"""
+    generator = get_generator(args)
+    code_generators = {target: generators[target] for target in args.target}
+    for code_generator in code_generators.values():
+        configure_code_generator(code_generator, args)
 
-        if args.target == "rust-sdk" and not args.resource:
-            resource_results: dict[str, dict] = {}
-            for mod_path, mod_name, path in res_mods:
-                mn = "/".join(mod_path)
-                x = resource_results.setdefault(
-                    mn, {"path": path, "mods": set()}
-                )
-                x["mods"].add(mod_name)
-            changed = True
-            while changed:
-                changed = False
-                for mod_path in [
-                    mod_path_str.split("/")
-                    for mod_path_str in resource_results.keys()
-                ]:
-                    if len(mod_path) < 3:
-                        continue
-                    mn = "/".join(mod_path[0:-1])
-                    mod_name = mod_path[-1]
-                    if mn in resource_results:
-                        if mod_name not in resource_results[mn]["mods"]:
-                            resource_results[mn]["mods"].add(mod_name)
-                            changed = True
-                    else:
-                        changed = True
-                        x = resource_results.setdefault(
-                            mn, {"path": path, "mods": set()}
-                        )
-                        x["mods"].add(mod_name)
-
-                for path, gen_data in resource_results.items():
-                    generators["rust-sdk"].generate_mod(
-                        args.work_dir,
-                        path.split("/"),
-                        gen_data["mods"],
-                        gen_data["path"],
-                        res.split(".")[-1].capitalize(),
-                        service_name=path.split("/")[0],
-                    )
+    if args.serve:
+        from codegenerator import server
+
+        server.GeneratorServer(args, generator, code_generators).serve(
+            args.serve
+        )
+        exit(0)
+
+    if args.watch:
+        if not (args.metadata or args.metadata_dir):
+            raise RuntimeError("--watch requires --metadata or --metadata-dir")
+        from codegenerator import watch
+
+        watch.Watcher(args, generator, code_generators).watch()
+        exit(0)
+
+    if args.metadata or args.metadata_dir:
+        generate_metadata(
+            args,
+            generator,
+            code_generators,
+            get_requested_metadata_files(args),
+        )
+        if args.check and report_diffs(code_generators):
+            exit(1)
         exit(0)
 
     rp = None
     if args.module and args.class_name:
         rp = ResourceProcessor(args.module, args.class_name)
 
-    generators[args.target].generate(
-        rp,
-        args.work_dir,
-        openapi_spec=None,
-        operation_id=args.openapi_operation_id,
-        args=args,
-    )
+    for target, code_generator in code_generators.items():
+        with profiling.operation(f"{target} {args.openapi_operation_id}"):
+            code_generator.generate(
+                rp,
+                args.work_dir,
+                openapi_spec=None,
+                operation_id=args.openapi_operation_id,
+                args=args,
+            )
+        code_generator.flush_format_queue()
+        log_output_stats(target, code_generator)
+    if args.check and report_diffs(code_generators):
+        exit(1)
+    if args.manifest and not args.check:
+        write_manifest(args.manifest, args.work_dir, code_generators)
 
 
 if __name__ == "__main__":
@@ -10,16 +10,20 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import hashlib
 import logging
+import os
 from pathlib import Path
+import pickle
 from typing import Any
 import re
 
-import jsonref
 import yaml
-from openapi_core import Spec
 from pydantic import BaseModel
 
+from codegenerator.common import refs
+from codegenerator import profiling
+
 VERSION_RE = re.compile(r"^[Vv]([0-9]+)(\.([0-9]+))?$")
 # RE to split name from camelCase or by [`:`,`_`,`-`]
 SPLIT_NAME_RE = re.compile(r"(?<=[a-z])(?=[A-Z])|:|_|-")
@@ -70,22 +74,196 @@ class BaseCompoundType(BaseModel):
     description: str | None = None
 
 
-def get_openapi_spec(path: str | Path):
-    """Load OpenAPI spec from a file"""
+class OpenAPISpec:
+    """Loaded OpenAPI spec
+
+    Thin wrapper around the spec giving access to the spec elements and
+    maintaining an index of operations by their operationId.
+    """
+
+    def __init__(self, spec, data: dict | None = None):
+        self.spec = spec
+        #: Spec content (i.e. with lazily resolved references)
+        self.data = data if data is not None else spec
+        self._operations: dict[str, tuple[str, str, dict]] | None = None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    @property
+    def operations(self) -> dict[str, tuple[str, str, dict]]:
+        """Index of operations as `operationId -> (path, method, spec)`"""
+        if self._operations is None:
+            self._operations = {}
+            for path, path_spec in self["paths"].items():
+                for method, method_spec in path_spec.items():
+                    if not isinstance(method_spec, dict):
+                        continue
+                    operation_id = method_spec.get("operationId")
+                    if operation_id:
+                        # First occurence wins
+                        self._operations.setdefault(
+                            operation_id, (path, method, method_spec)
+                        )
+        return self._operations
+
+    @profiling.timed("find_operation")
+    def get_operation(self, operationId: str) -> tuple[str, str, dict]:
+        """Find operation by operationId
+
+        :returns: tuple of (path, method, operation spec)
+        """
+        try:
+            return self.operations[operationId]
+        except KeyError:
+            raise RuntimeError(
+                f"Cannot find operation {operationId} specification"
+            )
+
+
+def _get_spec_cache_path(
+    path: str | Path, cache_dir: str | Path, suffix: str = ""
+) -> Path:
+    """Get path of the pre-resolved spec cache file"""
+    name = hashlib.md5(Path(path).resolve().as_posix().encode()).hexdigest()
+    return Path(cache_dir, "specs", f"{name}{suffix}.pickle")
+
+
+def _get_spec_file_info(path: str | Path) -> dict[str, Any]:
+    """Get spec file information identifying its content"""
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _load_cached_spec(path: str | Path, cache_path: Path) -> dict | None:
+    """Load pre-resolved spec data from the cache
+
+    Cache is valid when the file modification time and size did not change
+    or when the spec content hash is still the same.
+
+    :returns: resolved spec data or None when cache is not valid
+    """
+    if not cache_path.exists():
+        return None
+    try:
+        with open(cache_path, "rb") as fp:
+            # Header is pickled separately to be able to check it without
+            # loading the whole spec
+            header = pickle.load(fp)
+            file_info = _get_spec_file_info(path)
+            if header["file"] == file_info:
+                return pickle.load(fp)
+            with open(path, "rb") as spec_fp:
+                if hashlib.md5(spec_fp.read()).hexdigest() != header["hash"]:
+                    return None
+            spec_data = pickle.load(fp)
+    except Exception as ex:
+        logging.warning("Ignoring broken spec cache %s: %s", cache_path, ex)
+        return None
+    # Content is unchanged (i.e. file was touched or checked out again).
+    # Refresh the header so that the content is not hashed on every load.
+    _write_cached_spec(
+        path,
+        cache_path,
+        {"file": file_info, "hash": header["hash"]},
+        spec_data,
+    )
+    return spec_data
+
+
+def _save_cached_spec(path: str | Path, cache_path: Path, spec_data: dict):
+    """Save pre-resolved spec data into the cache"""
+    with open(path, "rb") as fp:
+        header = {
+            "file": _get_spec_file_info(path),
+            "hash": hashlib.md5(fp.read()).hexdigest(),
+        }
+    _write_cached_spec(path, cache_path, header, spec_data)
+
+
+def _write_cached_spec(
+    path: str | Path, cache_path: Path, header: dict, spec_data: dict
+):
+    """Write the cache file with the header and the spec data"""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as fp:
+            pickle.dump(header, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(spec_data, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as ex:
+        logging.warning("Cannot cache spec %s: %s", path, ex)
+        tmp_path.unlink(missing_ok=True)
+
+
+@profiling.timed("spec_load")
+def get_openapi_spec(
+    path: str | Path,
+    cache_dir: str | Path | None = None,
+    yaml_c_loader: bool = False,
+    lazy_refs: bool = False,
+) -> OpenAPISpec:
+    """Load OpenAPI spec from a file
+
+    :param path: Path to the spec file
+    :param cache_dir: Directory of the cache with already resolved specs. When
+        set the spec with resolved references is loaded from the cache if the
+        spec file is unchanged and stored into it otherwise.
+    :param yaml_c_loader: Use C-accelerated yaml loader when available
+    :param lazy_refs: Resolve references only when they are accessed instead
+        of resolving all of them while loading.
+    """
+    cache_path: Path | None = None
+    if cache_dir:
+        cache_path = _get_spec_cache_path(
+            path, cache_dir, "-lazy" if lazy_refs else ""
+        )
+        spec_data = _load_cached_spec(path, cache_path)
+        if spec_data is not None:
+            logging.debug("Using cached spec %s", path)
+            # Cached spec has been already validated
+            return _build_openapi_spec(
+                spec_data, lazy_refs, spec_validator_cls=None
+            )
+
+    loader: Any = yaml.SafeLoader
+    if yaml_c_loader:
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
     with open(path) as fp:
-        spec_data = jsonref.replace_refs(yaml.safe_load(fp), proxies=False)
-    return Spec.from_dict(spec_data)
+        spec_data = yaml.load(fp, Loader=loader)
+    if not lazy_refs:
+        import jsonref
+
+        spec_data = jsonref.replace_refs(spec_data, proxies=False)
+    spec = _build_openapi_spec(spec_data, lazy_refs)
+    if cache_path:
+        # Cache only validated spec and before the data is being touched by
+        # the generators
+        _save_cached_spec(path, cache_path, spec_data)
+    return spec
+
+
+def _build_openapi_spec(spec_data: dict, lazy_refs: bool, **kwargs):
+    """Build OpenAPISpec from the spec data"""
+    # openapi_core is heavy to import and not needed until spec is loaded
+    from openapi_core import Spec
+
+    if lazy_refs:
+        # Raw spec data is kept untouched (references are resolved in the
+        # wrapper) so that it remains safe for caching
+        return OpenAPISpec(
+            Spec.from_dict(spec_data, **kwargs),
+            refs.replace_refs_lazy(spec_data),
+        )
+    return OpenAPISpec(Spec.from_dict(spec_data, **kwargs))
 
 
 def find_openapi_operation(spec, operationId: str):
     """Find operation by operationId in the loaded spec"""
-    for path, path_spec in spec["paths"].items():
-        for method, method_spec in path_spec.items():
-            if not isinstance(method_spec, dict):
-                continue
-            if method_spec.get("operationId") == operationId:
-                return (path, method, method_spec)
-    raise RuntimeError(f"Cannot find operation {operationId} specification")
+    if not isinstance(spec, OpenAPISpec):
+        spec = OpenAPISpec(spec)
+    return spec.get_operation(operationId)
 
 
 def get_plural_form(resource: str) -> str:
@@ -0,0 +1,157 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Lazy resolution of the JSON references
+
+Eager `jsonref.replace_refs` walks the whole document resolving every `$ref`
+upfront. For the big specs only a fraction of the document is normally
+accessed by the generator, therefore it is possible to resolve references
+only when the element containing them is being accessed.
+"""
+
+import copy
+from typing import Any
+from urllib.parse import unquote
+
+
+class LazyRefList(list):
+    """List with already resolved elements"""
+
+    pass
+
+
+class LazyRefDict(dict):
+    """Dictionary resolving `$ref` of its values on access
+
+    Resolved values are stored back into the dictionary so that every
+    reference is resolved only once. It behaves like a normal `dict` for the
+    consumers (including `json.dumps`, `**` unpacking and `copy.deepcopy`).
+    """
+
+    __slots__ = ("_resolver",)
+
+    def __init__(self, data, resolver: "RefResolver"):
+        self._resolver = resolver
+        super().__init__(data)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        resolved = self._resolver.materialize(value)
+        if resolved is not value:
+            super().__setitem__(key, resolved)
+        return resolved
+
+    def __iter__(self):
+        # NOTE: overriding `__iter__` disables the `dict.update` fast path,
+        # which would otherwise copy unresolved values
+        return super().__iter__()
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def pop(self, key, *args):
+        if key in self:
+            value = self[key]
+            super().pop(key)
+            return value
+        return super().pop(key, *args)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self):
+        return LazyRefDict(self, self._resolver)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        # Deep copy is a completely independent and fully resolved document.
+        # The copy is registered before copying the values so that recursive
+        # references point back to it.
+        result: dict = {}
+        memo[id(self)] = result
+        for key, value in self.items():
+            result[key] = copy.deepcopy(value, memo)
+        return result
+
+
+class RefResolver:
+    """Resolver of the local references of the document
+
+    References are memoized per target so that all occurences of the same
+    `$ref` point to the same object (the same way as `jsonref.replace_refs`
+    with `proxies=False` does).
+    """
+
+    def __init__(self, document: dict):
+        self.document = document
+        #: Resolved references by their pointer
+        self.resolved: dict[str, Any] = {}
+        #: Wrapped dictionaries by the id of the original dictionary. The
+        #: original is kept as well to guarantee the id is not reused.
+        self.wrapped: dict[int, tuple[dict, LazyRefDict]] = {}
+
+    @property
+    def root(self) -> LazyRefDict:
+        """Lazily resolved root of the document"""
+        return self.materialize(self.document)
+
+    def resolve(self, ref: str) -> Any:
+        """Resolve reference pointer"""
+        if ref in self.resolved:
+            return self.resolved[ref]
+        if not ref.startswith("#"):
+            raise NotImplementedError(
+                f"Only local references are supported (got {ref})"
+            )
+        target: Any = self.document
+        for part in filter(None, ref[1:].split("/")):
+            if isinstance(target, dict) and "$ref" in target:
+                target = self.resolve(target["$ref"])
+            part = unquote(part).replace("~1", "/").replace("~0", "~")
+            if isinstance(target, list):
+                target = target[int(part)]
+            else:
+                target = target[part]
+        result = self.materialize(target)
+        self.resolved[ref] = result
+        return result
+
+    def materialize(self, value: Any) -> Any:
+        """Resolve value if it is a reference and wrap containers"""
+        if isinstance(value, (LazyRefDict, LazyRefList)):
+            return value
+        if isinstance(value, dict):
+            if "$ref" in value and isinstance(value["$ref"], str):
+                return self.resolve(value["$ref"])
+            if id(value) not in self.wrapped:
+                self.wrapped[id(value)] = (value, LazyRefDict(value, self))
+            return self.wrapped[id(value)][1]
+        if isinstance(value, list):
+            return LazyRefList(self.materialize(x) for x in value)
+        return value
+
+
+def replace_refs_lazy(document: dict) -> LazyRefDict:
+    """Get document with lazily resolved references"""
+    return RefResolver(document).root
@@ -10,7 +10,10 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import dataclasses
+import json
 import logging
+import pickle
 import re
 from typing import Type, Any, Generator, Tuple
 
@@ -20,6 +23,7 @@ from codegenerator.common import BasePrimitiveType
 from codegenerator.common import BaseCombinedType
 from codegenerator.common import BaseCompoundType
 from codegenerator import model
+from codegenerator import profiling
 from codegenerator import common
 
 
@@ -412,6 +416,73 @@ class RequestParameter(BaseModel):
         return self.data_type.lifetimes
 
 
+class ConversionCache:
+    """Rust types converted by the type managers
+
+    Identical models of the different operations and microversion variants
+    (i.e. the same body of several actions) are converted only once. The
+    whole state of the type manager after `TypeManager.set_models` is
+    stored, since conversion of a model depends on the other models (names
+    of the colliding structs, discarded duplicates). States are pickled so
+    that every type manager gets own copy.
+    """
+
+    def __init__(self):
+        #: Pickled type manager states by the type manager class and hash of
+        #: the models
+        self.entries: dict[tuple[str, str], bytes] = {}
+        #: Number of the models converted
+        self.converted: int = 0
+        #: Number of the models taken from the cache
+        self.reused: int = 0
+
+    def get_key(self, type_manager: str, models: list) -> tuple[str, str]:
+        """Build cache key of the models
+
+        Referenced models are identified by the structural hash of their
+        schema already calculated by the parser together with the names and
+        hashes of the parents. The only model without the reference (root)
+        is small and its content is hashed. Sets (i.e. enum literals) are
+        hashed in their iteration order, which is the order the converted
+        types are rendered in, so models differing only in it do not share
+        the entry.
+        """
+        parts: list[Any] = []
+        for model_ in models:
+            ref = model_.reference
+            if not ref:
+                parts.append(
+                    json.dumps(_encode_key_value(model_), sort_keys=True)
+                )
+                continue
+            chain = []
+            while ref:
+                chain.append((ref.name, ref.type.__name__, ref.hash_))
+                ref = ref.parent
+            parts.append(chain)
+        return (type_manager, model.dicthash_({"models": parts}))
+
+
+def _encode_key_value(value: Any) -> Any:
+    """Encode value of the model into json compatible data
+
+    Unlike `dataclasses.asdict` sets are not copied and keep their iteration
+    order.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            field.name: _encode_key_value(getattr(value, field.name))
+            for field in dataclasses.fields(value)
+        }
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_encode_key_value(x) for x in value]
+    if isinstance(value, dict):
+        return {k: _encode_key_value(v) for k, v in value.items()}
+    if isinstance(value, type):
+        return value.__name__
+    return value
+
+
 class TypeManager:
     """Rust type manager
 
@@ -471,21 +542,30 @@ class TypeManager:
     string_enum_class: Type[StringEnum] | StringEnum = StringEnum
 
     #: List of the models to be ignored
-    ignored_models: list[model.Reference] = []
+    ignored_models: list[
+        model.PrimitiveType | model.ADT | model.Reference
+    ] = []
 
-    def __init__(self):
+    def __init__(self, conversion_cache: ConversionCache | None = None):
         self.models = []
         self.refs = {}
         self.parameters = {}
+        #: Converted models shared with other type managers
+        self.conversion_cache = conversion_cache
+        #: Models by their reference (first occurence wins)
+        self.model_index: dict[model.Reference, model.ADT] = {}
+        #: References renamed after being used as keys of `refs`. Dict does
+        #: not find them by the new name anymore.
+        self.renamed_refs: list[model.Reference] = []
 
         # Set base mapping entries into the data_type_mapping
         for k, v in self.base_primitive_type_mapping.items():
             if k not in self.primitive_type_mapping:
                 self.primitive_type_mapping[k] = v
 
-        for k, v in self.base_data_type_mapping.items():
-            if k not in self.data_type_mapping:
-                self.data_type_mapping[k] = v
+        for adt, typ in self.base_data_type_mapping.items():
+            if adt not in self.data_type_mapping:
+                self.data_type_mapping[adt] = typ
 
     def get_local_attribute_name(self, name: str) -> str:
         """Get localized attribute name"""
@@ -516,6 +596,9 @@ class TypeManager:
         return name
 
     def _get_adt_by_reference(self, model_ref):
+        model_ = self.model_index.get(model_ref)
+        if model_ is not None:
+            return model_
         for model_ in self.models:
             if model_.reference == model_ref:
                 return model_
@@ -541,7 +624,7 @@ class TypeManager:
             xtyp = self.primitive_type_mapping.get(type_model.__class__)
             if not xtyp:
                 raise RuntimeError(f"No mapping for {type_model}")
-            return xtyp(**type_model.model_dump())
+            return xtyp(**dataclasses.asdict(type_model))
 
         # Composite/Compound type
         if model_ref and model_ref in self.refs:
@@ -707,7 +790,9 @@ class TypeManager:
                 kind_data_type = kind_data["local"]
                 kind_description: str | None = None
                 if isinstance(kind_data["model"], model.ADT):
-                    kind_name = self.get_model_name(kind_data["model"])
+                    kind_name = self.get_model_name(
+                        kind_data["model"].reference
+                    )
                     kind_description = kind_data["model"].description
                 else:
                     kind_name = f"F{cnt}"
@@ -834,11 +919,34 @@ class TypeManager:
             kinds.clear()
             kinds.append(bck)
 
+    @profiling.timed("set_models")
     def set_models(self, models):
         """Process (translate) ADT models into Rust models"""
+        cache_key: tuple[str, str] | None = None
+        if self.conversion_cache is not None:
+            cache_key = self.conversion_cache.get_key(
+                type(self).__name__, models
+            )
+            cached = self.conversion_cache.entries.get(cache_key)
+            if cached is not None:
+                (
+                    self.models,
+                    self.refs,
+                    self.ignored_models,
+                    self.model_index,
+                    self.renamed_refs,
+                ) = pickle.loads(cached)
+                self.conversion_cache.reused += len(models)
+                return
+            self.conversion_cache.converted += len(models)
         self.models = models
         self.refs = {}
         self.ignored_models = []
+        self.model_index = {}
+        self.renamed_refs = []
+        for model_ in models:
+            if model_.reference:
+                self.model_index.setdefault(model_.reference, model_)
         # A dictionary of model names to references to assign unique names
         unique_models: dict[str, model.Reference] = {}
         # iterate over all incoming models
@@ -884,7 +992,7 @@ class TypeManager:
                             )
                             + name
                         )
-                        other_model.name = new_other_name
+                        self.rename_reference(other_model, new_other_name)
                         unique_models[new_other_name] = other_model
                 elif isinstance(model_data_type, Struct):
                     # This is already an exceptional case (identity.mapping
@@ -937,6 +1045,31 @@ class TypeManager:
         for ignore_model in self.ignored_models:
             self.discard_model(ignore_model)
 
+        # Renamed keys of `refs` would be found by the new name in the copy
+        if (
+            self.conversion_cache is not None
+            and cache_key is not None
+            and not self.renamed_refs
+        ):
+            self.conversion_cache.entries[cache_key] = pickle.dumps(
+                (
+                    self.models,
+                    self.refs,
+                    self.ignored_models,
+                    self.model_index,
+                    self.renamed_refs,
+                )
+            )
+
+    def rename_reference(self, model_ref: model.Reference, name: str):
+        """Rename the model reference keeping the model index valid"""
+        model_ = self.model_index.pop(model_ref, None)
+        model_ref.name = name
+        if model_ is not None and model_.reference:
+            # Key might have been an equal reference of another model
+            self.model_index.setdefault(model_.reference, model_)
+        self.renamed_refs.append(model_ref)
+
     def get_subtypes(self):
         """Get all subtypes excluding TLA"""
         for k, v in self.refs.items():
@@ -1046,52 +1179,51 @@ class TypeManager:
         logging.debug(f"Request to discard {type_model}")
         if isinstance(type_model, model.Reference):
             type_model = self._get_adt_by_reference(type_model)
-        if not hasattr(type_model, "reference"):
+        if not isinstance(type_model, model.ADT):
             return
-        for ref, data in list(self.refs.items()):
-            if ref == type_model.reference:
-                sub_ref: model.Reference | None = None
-                if ref.type == model.Struct:
-                    logging.debug(
-                        "Element is a struct. Purging also field types"
-                    )
-                    # For struct type we cascadely discard all field types as
-                    # well
-                    for v in type_model.fields.values():
-                        if isinstance(v.data_type, model.Reference):
-                            sub_ref = v.data_type
-                        else:
-                            sub_ref = getattr(v.data_type, "reference", None)
-                        if sub_ref:
-                            logging.debug(f"Need to purge also {sub_ref}")
-                            self.discard_model(sub_ref)
-                elif ref.type == model.OneOfType:
-                    logging.debug(
-                        "Element is a OneOf. Purging also kinds types"
-                    )
-                    for v in type_model.kinds:
-                        if isinstance(v, model.Reference):
-                            sub_ref = v
-                        else:
-                            sub_ref = getattr(v, "reference", None)
-                        if sub_ref:
-                            logging.debug(f"Need to purge also {sub_ref}")
-                            self.discard_model(sub_ref)
-                elif ref.type == model.Array:
-                    logging.debug(
-                        f"Element is a Array. Purging also item type {type_model.item_type}"
-                    )
-                    if isinstance(type_model.item_type, model.Reference):
-                        sub_ref = type_model.item_type
-                    else:
-                        sub_ref = getattr(
-                            type_model.item_type, "reference", None
-                        )
-                    if sub_ref:
-                        logging.debug(f"Need to purge also {sub_ref}")
-                        self.discard_model(sub_ref)
-                logging.debug(f"Purging {ref} from models")
-                self.refs.pop(ref, None)
+        ref = type_model.reference
+        # Renamed references are only found by comparing them
+        if not ref or (
+            ref not in self.refs
+            and not any(x == ref for x in self.renamed_refs)
+        ):
+            return
+        sub_ref: model.Reference | None = None
+        if isinstance(type_model, model.Struct):
+            logging.debug("Element is a struct. Purging also field types")
+            # For struct type we cascadely discard all field types as
+            # well
+            for v in type_model.fields.values():
+                if isinstance(v.data_type, model.Reference):
+                    sub_ref = v.data_type
+                else:
+                    sub_ref = getattr(v.data_type, "reference", None)
+                if sub_ref:
+                    logging.debug(f"Need to purge also {sub_ref}")
+                    self.discard_model(sub_ref)
+        elif isinstance(type_model, model.OneOfType):
+            logging.debug("Element is a OneOf. Purging also kinds types")
+            for kind in type_model.kinds:
+                if isinstance(kind, model.Reference):
+                    sub_ref = kind
+                else:
+                    sub_ref = getattr(kind, "reference", None)
+                if sub_ref:
+                    logging.debug(f"Need to purge also {sub_ref}")
+                    self.discard_model(sub_ref)
+        elif isinstance(type_model, model.Array):
+            logging.debug(
+                f"Element is a Array. Purging also item type {type_model.item_type}"
+            )
+            if isinstance(type_model.item_type, model.Reference):
+                sub_ref = type_model.item_type
+            else:
+                sub_ref = getattr(type_model.item_type, "reference", None)
+            if sub_ref:
+                logging.debug(f"Need to purge also {sub_ref}")
+                self.discard_model(sub_ref)
+        logging.debug(f"Purging {ref} from models")
+        self.refs.pop(ref, None)
 
     def is_operation_supporting_params(self) -> bool:
         """Determine whether operation supports any sort of parameters"""
@@ -0,0 +1,203 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Manifest of the generated files
+
+Manifest records for every generated file the target it belongs to and the
+templates (including the included and imported partials) used to render it.
+Files generated for the metadata operations additionally record the
+operation, its metadata entry and fingerprints of all inputs (resolved
+operation spec, metadata entry, templates) together with the hash of the
+output itself. Together with the include graph of the templates it tells
+precisely which outputs are influenced by a modification, which outputs are
+up to date and which outputs are not produced anymore.
+
+Paths are stored relative to the root (work dir) of the manifest, so the
+manifest does not depend on the checkout location nor on the way the work
+dir is given on the command line.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Any
+from typing import TYPE_CHECKING
+
+from codegenerator import cache
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+#: Name of the manifest file in the work dir
+MANIFEST_NAME = ".codegenerator-manifest.json"
+#: Version of the manifest format. Manifests of other versions are ignored.
+MANIFEST_VERSION = 2
+
+
+def get_template_includes(env: "Environment", name: str) -> list[str]:
+    """Get templates included, imported or extended by the template
+
+    Only templates referenced with the constant names are known.
+    """
+    from jinja2 import meta
+    from jinja2 import TemplateNotFound
+
+    if not env.loader:
+        return []
+    try:
+        (source, _, _) = env.loader.get_source(env, name)
+    except TemplateNotFound:
+        # Template of the output from the previous run has been removed
+        return []
+    return sorted(
+        x for x in meta.find_referenced_templates(env.parse(source)) if x
+    )
+
+
+class Manifest:
+    """Manifest of the generated files"""
+
+    def __init__(self, root: str | Path = "."):
+        #: Directory the paths are relative to
+        self.root = Path(root).resolve()
+        #: Generated files by their path relative to the root
+        self.outputs: dict[str, dict[str, Any]] = {}
+        #: Templates used for the generated files by their name
+        self.templates: dict[str, dict[str, Any]] = {}
+        #: Hash of the generator sources
+        self.generator: str | None = None
+        #: Hashes of the templates
+        self.template_hashes: dict[str, str | None] = {}
+
+    @classmethod
+    def load(cls, path: str | Path, root: str | Path = ".") -> "Manifest":
+        """Load manifest (empty one when it does not exist)"""
+        result = cls(root)
+        try:
+            with open(path) as fp:
+                data = json.load(fp)
+            if data.get("version") != MANIFEST_VERSION:
+                logging.info("Ignoring manifest %s of other version", path)
+                return result
+            result.outputs = data["outputs"]
+            result.templates = data["templates"]
+            result.generator = data.get("generator")
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError):
+            logging.warning("Ignoring broken manifest %s", path)
+        return result
+
+    def get_relative_path(self, path: str | Path) -> str:
+        """Get normalized path relative to the root"""
+        return Path(
+            os.path.relpath(Path(path).resolve(), self.root)
+        ).as_posix()
+
+    def get_path(self, relative_path: str) -> Path:
+        """Get path of the output relative to the current directory"""
+        return Path(os.path.relpath(self.root / relative_path))
+
+    def get_template_hash(self, name: str) -> str | None:
+        """Get hash of the template"""
+        if name not in self.template_hashes:
+            self.template_hashes[name] = cache.get_file_hash(
+                cache.TEMPLATES_DIR / name
+            )
+        return self.template_hashes[name]
+
+    def add_outputs(
+        self,
+        target: str,
+        rendered_templates: dict[Path, list[str]],
+        **info: Any,
+    ):
+        """Add files generated for the target
+
+        Files must be already written (formatted).
+
+        :param rendered_templates: Templates used to render the files
+        :param info: Additional information of the outputs (i.e. operation)
+        """
+        for path, templates in rendered_templates.items():
+            templates_hash = hashlib.md5()
+            for name in templates:
+                templates_hash.update(
+                    f"{name}:{self.get_template_hash(name)};".encode()
+                )
+            self.outputs[self.get_relative_path(path)] = {
+                "target": target,
+                **info,
+                "templates": templates,
+                "templates_hash": templates_hash.hexdigest(),
+                "hash": cache.get_file_hash(path),
+            }
+
+    def merge(
+        self, previous: "Manifest", owned, keep_stale: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        """Keep outputs of the previous manifest not owned by this run
+
+        Outputs of the previous run within the scope of this run which are
+        not produced anymore are stale (i.e. operation has been removed from
+        the metadata). They are dropped unless `keep_stale` is set.
+
+        :param owned: Callable telling whether the output record of the
+            previous manifest belongs to the scope of this run
+        :returns: Stale outputs by their path
+        """
+        stale = {}
+        for path, output in previous.outputs.items():
+            if path in self.outputs:
+                continue
+            if owned(output):
+                stale[path] = output
+                if not keep_stale:
+                    continue
+            self.outputs[path] = output
+        return stale
+
+    def add_templates(self, env: "Environment"):
+        """Add include graph of all templates used by the outputs"""
+        names = sorted(
+            {
+                name
+                for output in self.outputs.values()
+                for name in output["templates"]
+            }
+        )
+        for name in names:
+            self.templates[name] = {
+                "hash": self.get_template_hash(name),
+                "includes": get_template_includes(env, name),
+            }
+
+    def get_data(self) -> dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "generator": self.generator,
+            "templates": self.templates,
+            "outputs": dict(sorted(self.outputs.items())),
+        }
+
+    def write(self, path: str | Path):
+        """Write manifest as JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=path.parent, delete=False
+        ) as fp:
+            json.dump(self.get_data(), fp, indent=2, sort_keys=True)
+        os.replace(fp.name, path)
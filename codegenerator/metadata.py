@@ -10,6 +10,7 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import io
 from pathlib import Path
 import logging
 import re
@@ -44,6 +45,9 @@ class MetadataGenerator(BaseGenerator):
             return
         yaml = YAML(typ="safe")
         with open(path) as fp:
+            # NOTE: lazy resolution is not used here. The whole document is
+            # validated into the schema models and pydantic reads the dict
+            # content directly, bypassing the lazy resolution.
             spec = jsonref.replace_refs(yaml.load(fp))
 
         return SpecSchema(**spec)
@@ -554,8 +558,8 @@ class MetadataGenerator(BaseGenerator):
             ):
                 show_op = res_data.operations["show"]
 
-                (path, _, spec) = common.find_openapi_operation(
-                    openapi_spec, show_op.operation_id
+                (path, _, spec) = openapi_spec.get_operation(
+                    show_op.operation_id
                 )
                 mod_path = common.get_rust_sdk_mod_path(
                     args.service_type, res_data.api_version or "", path
@@ -596,8 +600,8 @@ class MetadataGenerator(BaseGenerator):
                 list_op_ = list_detailed_op or list_op
                 if not list_op_:
                     continue
-                (_, _, list_spec) = common.find_openapi_operation(
-                    openapi_spec, list_op_.operation_id
+                (_, _, list_spec) = openapi_spec.get_operation(
+                    list_op_.operation_id
                 )
                 name_field: str = "name"
                 for fqan, alias in common.FQAN_ALIAS_MAP.items():
@@ -637,14 +641,16 @@ class MetadataGenerator(BaseGenerator):
         yaml.preserve_quotes = True
         yaml.default_flow_style = False
         yaml.indent(mapping=2, sequence=4, offset=2)
-        metadata_path.parent.mkdir(exist_ok=True, parents=True)
-        with open(metadata_path, "w") as fp:
-            yaml.dump(
-                metadata.model_dump(
-                    exclude_none=True, exclude_defaults=True, by_alias=True
-                ),
-                fp,
-            )
+        content = io.StringIO()
+        yaml.dump(
+            metadata.model_dump(
+                exclude_none=True, exclude_defaults=True, by_alias=True
+            ),
+            content,
+        )
+        # Written by the output sink (so that the check mode only compares)
+        self.output.add(metadata_path, content.getvalue())
+        self.output.commit(metadata_path)
 
 
 def get_operation_type_by_key(operation_key):
@@ -14,17 +14,19 @@
 from __future__ import annotations
 
 import copy
+import dataclasses
 import hashlib
 import json
 import logging
+import pickle
 from typing import Any
 from typing import Type
 import typing as ty
 
 from pydantic import BaseModel
-from pydantic import ConfigDict
 
 from codegenerator import common
+from codegenerator import profiling
 
 
 def dicthash_(data: dict[str, Any]) -> str:
@@ -35,10 +37,55 @@ def dicthash_(data: dict[str, Any]) -> str:
     return dh.hexdigest()
 
 
-class Reference(BaseModel):
-    """Reference of the complex type to the occurence instance"""
+class StructuralHasher:
+    """Structural hash calculator with the identity keyed cache
+
+    Hash of the container is calculated from hashes of its elements (Merkle
+    tree) and is cached per container identity. Nested schemas are therefore
+    serialized only once no matter how many parents embed them. Cache is
+    only valid as long as the data is not modified, so the hasher instance
+    should not outlive a single parse.
+    """
+
+    def __init__(self):
+        #: Hashes by the id of the container. Container is kept referenced to
+        #: guarantee the id is not reused.
+        self.cache: dict[int, tuple[Any, str]] = {}
+
+    def hash(self, data: Any) -> str:
+        """Calculate hash of the data"""
+        cached = self.cache.get(id(data))
+        if cached is not None:
+            return cached[1]
+        result = hashlib.md5(self._encode(data).encode()).hexdigest()
+        if isinstance(data, (dict, list)):
+            self.cache[id(data)] = (data, result)
+        return result
+
+    def _encode(self, data: Any) -> str:
+        """Encode data with nested containers replaced by their hashes"""
+        if isinstance(data, dict):
+            return (
+                "{"
+                + ",".join(
+                    json.dumps(k) + ":" + self._encode_element(v)
+                    for k, v in sorted(data.items())
+                )
+                + "}"
+            )
+        if isinstance(data, list):
+            return "[" + ",".join(self._encode_element(v) for v in data) + "]"
+        return json.dumps(data)
+
+    def _encode_element(self, data: Any) -> str:
+        if isinstance(data, (dict, list)):
+            return "#" + self.hash(data)
+        return json.dumps(data)
 
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+@dataclasses.dataclass(slots=True, eq=True)
+class Reference:
+    """Reference of the complex type to the occurence instance"""
 
     #: Name of the object that uses the type under reference
     name: str
@@ -47,19 +94,35 @@ class Reference(BaseModel):
     parent: Reference | None = None
 
     def __hash__(self):
-        return hash((self.name, self.type, self.hash_))
+        # Identical structs nested in the different parents must not collide
+        # in the dicts (parent is compared by `__eq__` anyway)
+        return hash(
+            (
+                self.name,
+                self.type,
+                self.hash_,
+                self.parent.hash_ if self.parent else None,
+            )
+        )
 
 
-class PrimitiveType(BaseModel):
+@dataclasses.dataclass(slots=True)
+class PrimitiveType:
     """Primitive Data Type stricture"""
 
-    pass
+    @classmethod
+    def from_schema(cls, schema: dict[str, Any]):
+        """Build the type from the schema ignoring unrelated keywords"""
+        names = _get_field_names(cls)
+        return cls(**{k: v for k, v in schema.items() if k in names})
 
 
+@dataclasses.dataclass(slots=True)
 class PrimitiveString(PrimitiveType):
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class ConstraintString(PrimitiveType):
     format: str | None = None
     minLength: int | None = None
@@ -68,10 +131,12 @@ class ConstraintString(PrimitiveType):
     enum: list[Any] | None = None
 
 
+@dataclasses.dataclass(slots=True)
 class PrimitiveNumber(PrimitiveType):
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class ConstraintNumber(PrimitiveNumber):
     format: str | None = None
     minimum: int | None = None
@@ -80,23 +145,28 @@ class ConstraintNumber(PrimitiveNumber):
     multipleOf: int | float | None = None
 
 
+@dataclasses.dataclass(slots=True)
 class ConstraintInteger(ConstraintNumber):
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class PrimitiveBoolean(PrimitiveType):
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class PrimitiveNull(PrimitiveType):
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class PrimitiveAny(PrimitiveType):
     pass
 
 
-class ADT(BaseModel):
+@dataclasses.dataclass(slots=True)
+class ADT:
     """Abstract Data Type / Composite - typically sort of
     collection of Primitives"""
 
@@ -104,38 +174,52 @@ class ADT(BaseModel):
     description: str | None = None
 
 
+@dataclasses.dataclass(slots=True, kw_only=True)
 class AbstractList(ADT):
     """Abstract list"""
 
     item_type: PrimitiveType | ADT | Reference
 
 
+@dataclasses.dataclass(slots=True)
 class AbstractCollection(ADT):
     """AllOf/OneOf/etc"""
 
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class AbstractContainer(ADT):
     """Struct/Object"""
 
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class OneOfType(ADT):
     """OneOf - a collection of data types where only one of the kinds can be used (a.k.a. enum)"""
 
-    kinds: list[PrimitiveType | ADT | Reference] = []
+    kinds: list[PrimitiveType | ADT | Reference] = dataclasses.field(
+        default_factory=list
+    )
 
 
+@dataclasses.dataclass(slots=True)
 class Enum(AbstractCollection):
     """Enum: a unique collection of primitives"""
 
-    base_types: list[type[PrimitiveType]] = []
-    literals: set[Any] = set()
+    base_types: list[type[PrimitiveType]] = dataclasses.field(
+        default_factory=list
+    )
+    #: Enum literals. A list (i.e. the schema "enum") is converted to a set
+    literals: set[Any] | list[Any] = dataclasses.field(default_factory=set)
+
+    def __post_init__(self):
+        self.literals = set(self.literals)
 
 
-class StructField(BaseModel):
+@dataclasses.dataclass(slots=True)
+class StructField:
     """Structure field: type + additional info"""
 
     data_type: PrimitiveType | ADT | Reference
@@ -145,51 +229,168 @@ class StructField(BaseModel):
     max_ver: str | None = None
 
 
+@dataclasses.dataclass(slots=True)
 class Struct(ADT):
     """Struct/Object"""
 
-    fields: dict[str, StructField] = {}
+    fields: dict[str, StructField] = dataclasses.field(default_factory=dict)
     additional_fields: PrimitiveType | ADT | None = None
     pattern_properties: dict[str, PrimitiveType | ADT] | None = None
 
 
+@dataclasses.dataclass(slots=True, kw_only=True)
 class Dictionary(ADT):
     """Simple dictionary with values of a single type"""
 
     value_type: PrimitiveType | ADT
 
 
+@dataclasses.dataclass(slots=True)
 class Array(AbstractList):
     """A pure list"""
 
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class CommaSeparatedList(AbstractList):
     """A list that is serialized comma separated"""
 
     pass
 
 
+@dataclasses.dataclass(slots=True)
 class Set(AbstractList):
     """A set of unique items"""
 
     pass
 
 
+#: Field names of the data types by the type
+_FIELD_NAMES: dict[type, frozenset[str]] = {}
+
+
+def _get_field_names(cls: type) -> frozenset[str]:
+    if cls not in _FIELD_NAMES:
+        _FIELD_NAMES[cls] = frozenset(x.name for x in dataclasses.fields(cls))
+    return _FIELD_NAMES[cls]
+
+
+#: Placeholder of the microversion boundaries inherited from the parent
+#: schema in the parsed models stored in the parse cache
+INHERITED_VERSION = "<inherited>"
+
+
+def _set_inherited_versions(
+    models: list[ADT], min_ver: str | None, max_ver: str | None
+):
+    """Replace inherited microversion placeholders of the struct fields"""
+    for x in models:
+        if isinstance(x, Struct):
+            for field in x.fields.values():
+                if field.min_ver == INHERITED_VERSION:
+                    field.min_ver = min_ver
+                if field.max_ver == INHERITED_VERSION:
+                    field.max_ver = max_ver
+
+
+def _get_reference_key(ref: Reference | None) -> tuple:
+    """Get key of the reference including its parents"""
+    key: list[tuple] = []
+    while ref:
+        key.append((ref.name, getattr(ref.type, "__name__", None), ref.hash_))
+        ref = ref.parent
+    return tuple(key)
+
+
+def _is_renamed(refs: list[tuple], results: list[ADT]) -> bool:
+    """Whether models with the references are renamed when added to results
+
+    Model is renamed when the model with the same name and type, but a
+    different schema is already present.
+    """
+    present: dict[tuple, set] = {}
+    for x in results:
+        if x.reference:
+            present.setdefault(
+                (x.reference.name, x.reference.type), set()
+            ).add(x.reference.hash_)
+    return any(
+        (name, type_) in present and hash_ not in present[(name, type_)]
+        for (name, type_, hash_) in refs
+    )
+
+
+def _dump_subtree(
+    obj: ADT, models: list[ADT], parent: Reference | None
+) -> tuple[list[tuple], bytes]:
+    """Dump parsed subtree for the parse cache
+
+    The parent reference belongs to the parsed schema and is detached from
+    the models while pickling.
+
+    :returns: tuple of the references of the models and pickled
+        `(obj, models, indexes of the models attached to the parent)`
+    """
+    refs = [
+        (x.reference.name, x.reference.type, x.reference.hash_)
+        for x in models
+        if x.reference
+    ]
+    attached = [
+        idx
+        for idx, x in enumerate(models)
+        if parent and x.reference and x.reference.parent is parent
+    ]
+    for idx in attached:
+        models[idx].reference.parent = None  # type: ignore[union-attr]
+    try:
+        return (refs, pickle.dumps((obj, models, attached)))
+    finally:
+        for idx in attached:
+            models[idx].reference.parent = parent  # type: ignore[union-attr]
+
+
 class JsonSchemaParser:
     """JsonSchema to internal DataModel converter"""
 
+    #: Structural hasher of the schemas for the current parse
+    hasher: StructuralHasher | None = None
+
+    def __init__(self, parse_cache: dict | None = None):
+        #: Parsed objects by the structural hash of the schema shared between
+        #: parsers (i.e. of different targets and operations of the run)
+        self.parse_cache = parse_cache
+        #: Number of the models renamed due to the name collisions
+        self.renamed: int = 0
+
+    @profiling.timed("parse")
     def parse(
         self, schema, ignore_read_only: bool = False
-    ) -> tuple[ADT | None, list[ADT]]:
-        """Parse JsonSchema object into internal DataModel"""
+    ) -> tuple[PrimitiveType | ADT, list[ADT]]:
+        """Parse JsonSchema object into internal DataModel
+
+        Parsed objects are cached by their structural hash (see
+        `parse_object`), so subschemas shared by different operations and
+        microversion variants (i.e. `server` returned by show and update or
+        `links` of many resources) are parsed only once.
+        """
         results: list[ADT] = []
-        res = self.parse_schema(
-            schema, results, ignore_read_only=ignore_read_only
-        )
+        # Hashes of the subschemas are reused by the references
+        hasher = self.hasher
+        self.hasher = hasher or StructuralHasher()
+        try:
+            res = self.parse_schema(
+                schema, results, ignore_read_only=ignore_read_only
+            )
+        finally:
+            self.hasher = hasher
         return (res, results)
 
+    def schema_hash(self, schema) -> str:
+        """Calculate structural hash of the schema"""
+        return (self.hasher or StructuralHasher()).hash(schema)
+
     def parse_schema(
         self,
         schema,
@@ -237,15 +438,15 @@ class JsonSchemaParser:
                     ignore_read_only=ignore_read_only,
                 )
             if type_ == "string":
-                obj = ConstraintString(**schema)
+                obj = ConstraintString.from_schema(schema)
                 # todo: set obj props
                 return obj
             if type_ == "integer":
-                obj = ConstraintInteger(**schema)
+                obj = ConstraintInteger.from_schema(schema)
                 # todo: set obj props
                 return obj
             if type_ == "number":
-                obj = ConstraintNumber(**schema)
+                obj = ConstraintNumber.from_schema(schema)
                 # todo: set obj props
                 return obj
             if type_ == "boolean":
@@ -286,7 +487,7 @@ class JsonSchemaParser:
             # `{}` is `Any` according to jsonschema
             return PrimitiveAny()
         if not type_ and "format" in schema:
-            return ConstraintString(**schema)
+            return ConstraintString.from_schema(schema)
         raise RuntimeError("Cannot determine type for %s", schema)
 
     def parse_object(
@@ -314,7 +515,71 @@ class JsonSchemaParser:
 
         `if-then-else` are ignored since their main purpose is data validation
         and not the schema definition.
+
+        Parsed objects are cached in the `parse_cache` by the structural hash
+        of the schema and the place of the occurrence together with the
+        models they add into the results. Cached models are only reused when
+        they would not be renamed due to the name collisions with the models
+        already in the results. Microversion boundaries inherited from the
+        parents are only stamped into the fields of the reused models, so
+        identical subtrees of the microversion variants (which differ in the
+        `x-openstack` of the body) are parsed once.
         """
+        if self.parse_cache is None:
+            return self._parse_object(
+                schema,
+                results,
+                name=name,
+                parent=parent,
+                min_ver=min_ver,
+                max_ver=max_ver,
+                ignore_read_only=ignore_read_only,
+            )
+        cache_key = (
+            type(self).__name__,
+            self.schema_hash(schema),
+            name,
+            _get_reference_key(parent),
+            ignore_read_only,
+        )
+        cached = self.parse_cache.get(cache_key)
+        if cached is not None and not _is_renamed(cached[0], results):
+            # Consumers modify parsed models, so every occurrence gets a
+            # private copy (unpickling is cheaper than deepcopy)
+            (obj, models, attached) = pickle.loads(cached[1])
+            for idx in attached:
+                models[idx].reference.parent = parent
+            _set_inherited_versions(models, min_ver, max_ver)
+            results.extend(models)
+            return obj
+
+        start = len(results)
+        renamed = self.renamed
+        obj = self._parse_object(
+            schema,
+            results,
+            name=name,
+            parent=parent,
+            min_ver=INHERITED_VERSION,
+            max_ver=INHERITED_VERSION,
+            ignore_read_only=ignore_read_only,
+        )
+        models = results[start:]
+        if self.renamed == renamed:
+            self.parse_cache[cache_key] = _dump_subtree(obj, models, parent)
+        _set_inherited_versions(models, min_ver, max_ver)
+        return obj
+
+    def _parse_object(
+        self,
+        schema,
+        results: list[ADT],
+        name: str | None = None,
+        parent: Reference | None = None,
+        min_ver: str | None = None,
+        max_ver: str | None = None,
+        ignore_read_only: bool | None = False,
+    ):
         obj: ADT | None = None
         properties = schema.get("properties")
         additional_properties = schema.get("additionalProperties")
@@ -332,7 +597,7 @@ class JsonSchemaParser:
                 obj.reference = Reference(
                     name=name,
                     type=obj.__class__,
-                    hash_=dicthash_(schema),
+                    hash_=self.schema_hash(schema),
                     parent=parent,
                 )
 
@@ -396,7 +661,7 @@ class JsonSchemaParser:
                 )
                 pattern_props[key_pattern] = type_kind  # type: ignore
 
-        if obj:
+        if isinstance(obj, Struct):
             if additional_properties_type:
                 # `"type": "object", "properties": {...}, "additional_properties": ...`
                 obj.additional_fields = additional_properties_type
@@ -444,7 +709,7 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name,
                 type=obj.__class__,
-                hash_=dicthash_(schema),
+                hash_=self.schema_hash(schema),
                 parent=parent,
             )
 
@@ -459,8 +724,14 @@ class JsonSchemaParser:
                     if x.reference
                 ]
             ):
-                if obj.reference.__hash__() in [
-                    x.reference.__hash__() for x in results if x.reference
+                if (
+                    obj.reference.name,
+                    obj.reference.type,
+                    obj.reference.hash_,
+                ) in [
+                    (x.reference.name, x.reference.type, x.reference.hash_)
+                    for x in results
+                    if x.reference
                 ]:
                     # This is already same object - we have luck and can
                     # de-duplicate structures. It is at the moment the case in
@@ -469,6 +740,7 @@ class JsonSchemaParser:
                     pass
                 else:
                     logging.error(f"replace {obj.reference.name}")
+                    self.renamed += 1
                     # Structure with the same name is already present. Prefix the
                     # new one with the parent name
                     if parent and name:
@@ -513,7 +785,7 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name,
                 type=obj.__class__,
-                hash_=dicthash_(schema),
+                hash_=self.schema_hash(schema),
                 parent=parent,
             )
         results.append(obj)
@@ -528,8 +800,10 @@ class JsonSchemaParser:
         ignore_read_only: bool | None = False,
     ):
         if len(schema.get("type")) == 1:
-            # Bad schema with type being a list of 1 entry
-            schema["type"] = schema["type"][0]
+            # Bad schema with type being a list of 1 entry. Spec is shared
+            # between the operations (and the runs of the long-living
+            # generator) and must not be modified
+            schema = {**schema, "type": schema["type"][0]}
             obj = self.parse_schema(
                 schema, results, name=name, ignore_read_only=ignore_read_only
             )
@@ -555,7 +829,7 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name,
                 type=obj.__class__,
-                hash_=dicthash_(schema),
+                hash_=self.schema_hash(schema),
                 parent=parent,
             )
         results.append(obj)
@@ -586,7 +860,7 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name,
                 type=obj.__class__,
-                hash_=dicthash_(schema),
+                hash_=self.schema_hash(schema),
                 parent=parent,
             )
         results.append(obj)
@@ -618,7 +892,7 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name,
                 type=obj.__class__,
-                hash_=dicthash_(schema),
+                hash_=self.schema_hash(schema),
                 parent=parent,
             )
         results.append(obj)
@@ -670,8 +944,9 @@ class OpenAPISchemaParser(JsonSchemaParser):
         param_typ = param_schema.get("type")
         dt: PrimitiveType | ADT | None = None
         if isinstance(param_typ, list):
-            if "null" in param_typ:
-                param_typ.remove("null")
+            # Spec is shared between the operations (and the runs of the
+            # long-living generator) and must not be modified
+            param_typ = [x for x in param_typ if x != "null"]
             if len(param_typ) == 1:
                 param_typ = param_typ[0]
         if param_typ == "string":
@@ -680,15 +955,15 @@ class OpenAPISchemaParser(JsonSchemaParser):
             # if "enum" in param_schema:
             #     dt = Enum(literals=param_schema["enum"], base_types=[ConstraintString])
             # else:
-            dt = ConstraintString(**param_schema)
+            dt = ConstraintString.from_schema(param_schema)
         elif param_typ == "number":
-            dt = ConstraintNumber(**param_schema)
+            dt = ConstraintNumber.from_schema(param_schema)
         elif param_typ == "integer":
-            dt = ConstraintInteger(**param_schema)
+            dt = ConstraintInteger.from_schema(param_schema)
         elif param_typ == "boolean":
-            dt = PrimitiveBoolean(**param_schema)
+            dt = PrimitiveBoolean.from_schema(param_schema)
         elif param_typ == "null":
-            dt = PrimitiveNull(**param_schema)
+            dt = PrimitiveNull.from_schema(param_schema)
         elif param_typ == "array":
             try:
                 items_type = param_schema.get("items").get("type")
@@ -718,16 +993,18 @@ class OpenAPISchemaParser(JsonSchemaParser):
             elif param_location == "query" and sorted(
                 ["string", "integer"]
             ) == sorted(param_typ):
-                dt = ConstraintInteger(**param_schema)
+                dt = ConstraintInteger.from_schema(param_schema)
             elif param_location == "query" and sorted(
                 ["string", "number"]
             ) == sorted(param_typ):
-                dt = ConstraintNumber(**param_schema)
+                dt = ConstraintNumber.from_schema(param_schema)
 
         if isinstance(dt, ADT):
             # Set reference into the data_type so that it doesn't mess with main body types
             dt.reference = Reference(
-                name=param_name, type=RequestParameter, hash_=dicthash_(schema)
+                name=param_name,
+                type=RequestParameter,
+                hash_=self.schema_hash(schema),
             )
 
         is_flag: bool = False
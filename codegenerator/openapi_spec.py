@@ -17,6 +17,9 @@ from codegenerator.base import BaseGenerator
 
 
 class OpenApiSchemaGenerator(BaseGenerator):
+    #: Specs are dumped by the service specific generators directly
+    output_sink_supported = False
+
     def __init__(self):
         super().__init__()
 
@@ -0,0 +1,132 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+import difflib
+import logging
+import os
+from pathlib import Path
+import shutil
+import uuid
+
+
+def unified_diff(path: Path, old: bytes | None, new: str | None) -> str:
+    """Unified diff of the file content
+
+    :param old: Existing content (`None` when file does not exist)
+    :param new: New content (`None` when file is to be removed)
+    """
+    old_lines = (
+        old.decode(errors="replace").splitlines(keepends=True)
+        if old is not None
+        else []
+    )
+    new_lines = new.splitlines(keepends=True) if new is not None else []
+    return "".join(
+        difflib.unified_diff(
+            old_lines,
+            new_lines,
+            fromfile=f"a/{path.as_posix()}"
+            if old is not None
+            else "/dev/null",
+            tofile=f"b/{path.as_posix()}" if new is not None else "/dev/null",
+        )
+    )
+
+
+def write_atomic(path: Path, data: bytes, keep_mode: bool = False):
+    """Replace the file atomically with the data
+
+    New file gets the default permissions (umask is applied by the kernel)
+    or the permissions of the replaced file with `keep_mode`.
+    """
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        if keep_mode:
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class OutputSink:
+    """Sink of the generated files
+
+    Rendered content is kept in memory until it is committed (i.e. after
+    being formatted). Files are only replaced (atomically) when the final
+    content differs from the existing one, so that unchanged files keep
+    their modification time and do not trigger rebuild of the generated
+    code. In the dry run mode files are never written and differences from
+    the existing files are collected instead.
+    """
+
+    def __init__(self):
+        #: Rendered content not yet written
+        self.pending: dict[Path, str] = {}
+        #: Number of the committed files by the status
+        self.stats: dict[str, int] = {"new": 0, "changed": 0, "unchanged": 0}
+        #: Only compare the content with the existing files
+        self.dry_run: bool = False
+        #: Unified diffs of the files differing from the existing ones (only
+        #: collected in the dry run mode)
+        self.diffs: dict[Path, str] = {}
+
+    def add(self, path: str | Path, content: str):
+        """Add rendered content of the file"""
+        self.pending[Path(path)] = content
+
+    def get_pending(self, path: str | Path) -> list[Path]:
+        """Get pending files of the path (file itself or files under it)"""
+        path = Path(path)
+        if path in self.pending:
+            return [path]
+        return [x for x in self.pending if path in x.parents]
+
+    def commit(self, path: str | Path, content: str | None = None) -> str:
+        """Write the file when its content has changed
+
+        :param content: Final content of the file. Pending content is used
+            when not given.
+        :returns: status of the file (new, changed or unchanged)
+        """
+        path = Path(path)
+        pending = self.pending.pop(path, None)
+        if content is None:
+            content = pending
+        if content is None:
+            raise RuntimeError(f"No content for {path} has been rendered")
+        data = content.encode()
+        try:
+            with open(path, "rb") as fp:
+                existing: bytes | None = fp.read()
+        except FileNotFoundError:
+            existing = None
+        if existing == data:
+            status = "unchanged"
+        elif self.dry_run:
+            status = "new" if existing is None else "changed"
+            self.diffs[path] = unified_diff(path, existing, content)
+        else:
+            status = "new" if existing is None else "changed"
+            logging.debug(f"Writing {path}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(path, data, keep_mode=existing is not None)
+        self.stats[status] += 1
+        return status
+
+    def commit_all(self):
+        """Commit all pending files"""
+        for path in list(self.pending):
+            self.commit(path)
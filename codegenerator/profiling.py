@@ -0,0 +1,199 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Phase and operation timings of the generator runs
+
+Profiling is disabled by default and the instrumentation points are then
+no-ops. Once enabled with `enable` time spent in every phase (spec loading,
+schema parsing, rendering, formatting, ...) is accumulated globally and for
+the operation currently being generated.
+"""
+
+import contextlib
+import functools
+import json
+from pathlib import Path
+import time
+from typing import Any
+
+#: Reusable no-op context of the disabled profiling
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Profiler:
+    """Collector of the phase and operation timings"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        #: Accumulated time of the phases
+        self.phases: dict[str, float] = {}
+        #: Number of the phase invocations
+        self.counts: dict[str, int] = {}
+        #: Timings of the operations with time of the phases inside of them
+        self.operations: dict[str, dict[str, Any]] = {}
+        #: Operation being currently generated
+        self.current_operation: dict[str, Any] | None = None
+        #: Phases currently running (nested invocation of the same phase is
+        #: not counted twice)
+        self.active: set[str] = set()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Measure time of the phase"""
+        if name in self.active:
+            yield
+            return
+        self.active.add(name)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.active.discard(name)
+            self.add_phase(name, elapsed)
+
+    def add_phase(self, name: str, elapsed: float, count: int = 1):
+        """Register time spent in the phase"""
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+        self.counts[name] = self.counts.get(name, 0) + count
+        if self.current_operation is not None:
+            phases = self.current_operation["phases"]
+            phases[name] = phases.get(name, 0.0) + elapsed
+
+    @contextlib.contextmanager
+    def operation(self, name: str):
+        """Measure time of the operation generation"""
+        operation = self.operations.setdefault(
+            name, {"time": 0.0, "phases": {}}
+        )
+        previous = self.current_operation
+        self.current_operation = operation
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            operation["time"] += time.monotonic() - start
+            self.current_operation = previous
+
+    def merge(self, data: dict[str, Any]):
+        """Merge timings collected by another profiler (i.e. in a worker)
+
+        :param data: Result of the `get_data` of another profiler
+        """
+        for name, phase in data["phases"].items():
+            self.add_phase(name, phase["time"], phase["count"])
+        for name, operation in data["operations"].items():
+            target = self.operations.setdefault(
+                name, {"time": 0.0, "phases": {}}
+            )
+            target["time"] += operation["time"]
+            for phase_name, elapsed in operation["phases"].items():
+                target["phases"][phase_name] = (
+                    target["phases"].get(phase_name, 0.0) + elapsed
+                )
+
+    def get_data(self, top: int | None = None) -> dict[str, Any]:
+        """Get collected timings
+
+        :param top: Number of the slowest operations to report
+        """
+        slowest = sorted(
+            self.operations.items(), key=lambda x: x[1]["time"], reverse=True
+        )
+        return {
+            "total": time.monotonic() - self.start,
+            "phases": {
+                name: {"time": elapsed, "count": self.counts[name]}
+                for name, elapsed in sorted(
+                    self.phases.items(), key=lambda x: x[1], reverse=True
+                )
+            },
+            "operations": self.operations,
+            "slowest_operations": [
+                {"operation": name, **data}
+                for name, data in slowest[slice(top)]
+            ],
+        }
+
+    def write(self, path: str | Path, top: int | None = None):
+        """Write timings as JSON"""
+        with open(path, "w") as fp:
+            json.dump(self.get_data(top), fp, indent=2)
+
+    def format_table(self, top: int | None = None) -> str:
+        """Format timings as a human readable table"""
+        data = self.get_data(top)
+        lines = [f"{'Phase':<40} {'Calls':>8} {'Time, s':>10}"]
+        for name, phase in data["phases"].items():
+            lines.append(
+                f"{name:<40} {phase['count']:>8} {phase['time']:>10.3f}"
+            )
+        lines.append(f"{'Total':<40} {'':>8} {data['total']:>10.3f}")
+        lines.append("")
+        lines.append(f"{'Slowest operations':<49} {'Time, s':>10}")
+        for operation in data["slowest_operations"]:
+            lines.append(
+                f"{operation['operation']:<49} {operation['time']:>10.3f}"
+            )
+        return "\n".join(lines)
+
+
+#: Active profiler (`None` when profiling is disabled)
+_profiler: Profiler | None = None
+
+
+def enable() -> Profiler:
+    """Enable profiling (dropping already collected timings)"""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable():
+    """Disable profiling"""
+    global _profiler
+    _profiler = None
+
+
+def get_profiler() -> Profiler | None:
+    """Get active profiler"""
+    return _profiler
+
+
+def phase(name: str):
+    """Context measuring time of the phase when profiling is enabled"""
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.phase(name)
+
+
+def operation(name: str):
+    """Context measuring time of the operation when profiling is enabled"""
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.operation(name)
+
+
+def timed(name: str):
+    """Decorator measuring time of the function as the phase"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _profiler.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -12,7 +12,6 @@
 #
 import logging
 from pathlib import Path
-import subprocess
 import re
 from typing import Type
 
@@ -830,7 +829,7 @@ class ResponseTypeManager(common_rust.TypeManager):
                 self.ignored_models.append(type_model.item_type)
             elif (
                 isinstance(item_type, model.Reference)
-                and type_model.item_type.type == model.Struct
+                and item_type.type == model.Struct
             ):
                 # Array of complex Structs is replaced on output by Json Value
                 typ = common_rust.JsonValue()
@@ -964,17 +963,26 @@ class ResponseTypeManager(common_rust.TypeManager):
 
 
 class RustCliGenerator(BaseGenerator):
+    format_command: list[str] = [
+        "rustfmt",
+        "--edition",
+        "2021",
+        # Child modules are not necessarily generated (or staged)
+        "--config",
+        "skip_children=true",
+    ]
+    format_stdin_command: list[str] = [
+        "rustfmt",
+        "--edition",
+        "2021",
+        "--emit",
+        "stdout",
+    ]
+    format_api_supported: bool = False
+
     def __init__(self):
         super().__init__()
 
-    def _format_code(self, *args):
-        """Format code using Rustfmt
-
-        :param *args: Path to the code to format
-        """
-        for path in args:
-            subprocess.run(["rustfmt", "--edition", "2021", path])
-
     def get_parser(self, parser):
         parser.add_argument(
             "--operation-type",
@@ -1031,13 +1039,15 @@ class RustCliGenerator(BaseGenerator):
         if not operation_id:
             operation_id = args.openapi_operation_id
 
-        (path, method, spec) = common.find_openapi_operation(
-            openapi_spec, operation_id
-        )
+        (path, method, spec) = openapi_spec.get_operation(operation_id)
         _, res_name = res.split(".") if res else (None, None)
         resource_name = common.get_resource_names_from_url(path)[-1]
 
-        openapi_parser = model.OpenAPISchemaParser()
+        # Identical subtrees of the microversion variants are parsed once
+        # even without the cache shared with other operations
+        openapi_parser = model.OpenAPISchemaParser(
+            parse_cache={} if self.parse_cache is None else self.parse_cache
+        )
         operation_params: list[model.RequestParameter] = []
         sdk_mod_path_base = common.get_rust_sdk_mod_path(
             args.service_type, args.api_version, args.module_path or path
@@ -1102,9 +1112,11 @@ class RustCliGenerator(BaseGenerator):
         for operation_variant in operation_variants:
             logging.debug(f"Processing variant {operation_variant}")
             additional_imports = set(global_additional_imports)
-            type_manager: common_rust.TypeManager = RequestTypeManager()
+            type_manager: common_rust.TypeManager = RequestTypeManager(
+                conversion_cache=self.conversion_cache
+            )
             response_type_manager: common_rust.TypeManager = (
-                ResponseTypeManager()
+                ResponseTypeManager(conversion_cache=self.conversion_cache)
             )
             result_is_list: bool = False
             is_list_paginated: bool = False
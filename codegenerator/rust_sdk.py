@@ -13,7 +13,6 @@
 import logging
 from pathlib import Path
 import re
-import subprocess
 from typing import Type, Any
 
 from codegenerator.base import BaseGenerator
@@ -268,17 +267,26 @@ class TypeManager(common_rust.TypeManager):
 
 
 class RustSdkGenerator(BaseGenerator):
+    format_command: list[str] = [
+        "rustfmt",
+        "--edition",
+        "2021",
+        # Child modules are not necessarily generated (or staged)
+        "--config",
+        "skip_children=true",
+    ]
+    format_stdin_command: list[str] = [
+        "rustfmt",
+        "--edition",
+        "2021",
+        "--emit",
+        "stdout",
+    ]
+    format_api_supported: bool = False
+
     def __init__(self):
         super().__init__()
 
-    def _format_code(self, *args):
-        """Format code using Rustfmt
-
-        :param *args: Path to the code to format
-        """
-        for path in args:
-            subprocess.run(["rustfmt", "--edition", "2021", path])
-
     def get_parser(self, parser):
         parser.add_argument(
             "--response-key",
@@ -313,9 +321,7 @@ class RustSdkGenerator(BaseGenerator):
             openapi_spec = common.get_openapi_spec(args.openapi_yaml_spec)
         if not operation_id:
             operation_id = args.openapi_operation_id
-        (path, method, spec) = common.find_openapi_operation(
-            openapi_spec, operation_id
-        )
+        (path, method, spec) = openapi_spec.get_operation(operation_id)
         if args.operation_type == "find":
             yield self.generate_find_mod(
                 target_dir,
@@ -336,7 +342,11 @@ class RustSdkGenerator(BaseGenerator):
         res_name = path_resources[-1]
 
         mime_type = None
-        openapi_parser = model.OpenAPISchemaParser()
+        # Identical subtrees of the microversion variants are parsed once
+        # even without the cache shared with other operations
+        openapi_parser = model.OpenAPISchemaParser(
+            parse_cache={} if self.parse_cache is None else self.parse_cache
+        )
         operation_params: list[model.RequestParameter] = []
         type_manager: TypeManager | None = None
         is_json_patch: bool = False
@@ -391,7 +401,7 @@ class RustSdkGenerator(BaseGenerator):
 
             class_name = res_name.title()
             operation_body = operation_variant.get("body")
-            type_manager = TypeManager()
+            type_manager = TypeManager(conversion_cache=self.conversion_cache)
             type_manager.set_parameters(operation_params)
             mod_name = "_".join(
                 x.lower()
@@ -546,7 +556,9 @@ class RustSdkGenerator(BaseGenerator):
         work_dir = Path(target_dir, "rust", "openstack_sdk", "src")
         impl_path = Path(work_dir, "api", "/".join(mod_path), "find.rs")
         # Collect all operation parameters
-        openapi_parser = model.OpenAPISchemaParser()
+        openapi_parser = model.OpenAPISchemaParser(
+            parse_cache=self.parse_cache
+        )
         path_resources = common.get_resource_names_from_url(path)
         res_name = path_resources[-1]
         operation_path_params: list[model.RequestParameter] = []
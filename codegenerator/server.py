@@ -0,0 +1,206 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Long-lived generator process
+
+Specs, parsed metadata, the template environment and the model caches are
+kept in memory between the requests so that regenerating a single resource
+does not pay the interpreter startup, imports and spec parsing again. The
+generation caches are kept as well, so operations with unchanged inputs are
+not rendered and formatted again.
+Requests are JSON objects (one per line) read from the Unix socket or stdin.
+Every request is answered with a single JSON line::
+
+    {"id": 1, "metadata": "compute_metadata.yaml", "service": "compute"}
+    {"id": 1, "status": "ok", "time": 0.05, "output": {"rust-sdk": {...}}}
+
+Besides `generate` (default) `ping` and `shutdown` commands are supported.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+from pathlib import Path
+import socketserver
+import sys
+import time
+from typing import Any, TextIO
+
+from codegenerator import cache
+from codegenerator import cli
+from codegenerator.base import BaseGenerator
+
+#: Request fields overriding the command line arguments of the server
+REQUEST_ARGS = ["metadata", "metadata_dir", "service", "resource", "work_dir"]
+
+
+class GeneratorServer:
+    """Generator serving generate requests"""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        generator: cli.Generator,
+        code_generators: dict[str, BaseGenerator],
+    ):
+        self.args = args
+        self.generator = generator
+        self.code_generators = code_generators
+        self.running = True
+        #: Generation caches kept between the requests
+        self.caches = {
+            target: cache.GenerationCache(
+                Path(args.cache_dir, f"generate_{target}.json")
+                if args.cache_dir
+                else None
+            )
+            for target in args.target
+        }
+
+    def warm_up(self):
+        """Load metadata and specs given on the command line upfront"""
+        if not (self.args.metadata or self.args.metadata_dir):
+            return
+        start = time.monotonic()
+        for metadata_path in cli.get_requested_metadata_files(
+            self.args
+        ).values():
+            self.generator.load_metadata(metadata_path)
+            for res_data in self.generator.metadata.resources.values():
+                for op_data in res_data.operations.values():
+                    self.generator.get_openapi_spec(
+                        Path(op_data.spec_file or res_data.spec_file).resolve()
+                    )
+        logging.info("Server warmed up in %.2fs", time.monotonic() - start)
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Process single request
+
+        :returns: Response data
+        """
+        command = request.get("command", "generate")
+        if command == "ping":
+            return {"status": "ok"}
+        if command == "shutdown":
+            self.running = False
+            return {"status": "ok"}
+        if command != "generate":
+            raise RuntimeError(f"Unsupported command {command}")
+        unknown = set(request) - {"id", "command", *REQUEST_ARGS}
+        if unknown:
+            raise RuntimeError(
+                f"Unsupported request fields: {', '.join(sorted(unknown))}"
+            )
+        args = argparse.Namespace(**vars(self.args))
+        for name in REQUEST_ARGS:
+            if name in request:
+                setattr(args, name, request[name])
+        if not (args.metadata or args.metadata_dir):
+            raise RuntimeError("Either metadata or metadata_dir is required")
+
+        start = time.monotonic()
+        for path in self.generator.drop_changed():
+            logging.info("Reloading modified %s", path)
+        cli.reset_code_generators(self.code_generators)
+        for generation_cache in self.caches.values():
+            generation_cache.hits = generation_cache.misses = 0
+        cli.generate_metadata(
+            args,
+            self.generator,
+            self.code_generators,
+            cli.get_requested_metadata_files(args),
+            self.caches,
+        )
+        return {
+            "status": "ok",
+            "time": time.monotonic() - start,
+            "output": {
+                target: code_generator.output.stats
+                for target, code_generator in self.code_generators.items()
+            },
+            "cache": {
+                target: {
+                    "hits": generation_cache.hits,
+                    "misses": generation_cache.misses,
+                }
+                for target, generation_cache in self.caches.items()
+            },
+        }
+
+    def handle_line(self, line: str) -> str | None:
+        """Process request line
+
+        :returns: Response line or `None` for the empty request
+        """
+        if not line.strip():
+            return None
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RuntimeError("Request must be a JSON object")
+            request_id = request.get("id")
+            response = self.handle(request)
+        except Exception as ex:
+            logging.exception("Request failed")
+            response = {"status": "error", "error": str(ex)}
+        return json.dumps({"id": request_id, **response})
+
+    def serve_stream(self, infile: TextIO, outfile: TextIO):
+        """Serve requests read from the stream until EOF or shutdown"""
+        # Generators must not write anything else into the responses
+        with contextlib.redirect_stdout(sys.stderr):
+            for line in infile:
+                response = self.handle_line(line)
+                if response is not None:
+                    outfile.write(response + "\n")
+                    outfile.flush()
+                if not self.running:
+                    break
+
+    def serve_socket(self, path: str):
+        """Serve requests on the Unix socket until shutdown
+
+        Connections are served one after another since the generators keep
+        state of the current run.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    response = server.handle_line(line.decode())
+                    if response is not None:
+                        self.wfile.write(response.encode() + b"\n")
+                        self.wfile.flush()
+                    if not server.running:
+                        break
+
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        with socketserver.UnixStreamServer(path, Handler) as unix_server:
+            logging.info("Listening on %s", path)
+            try:
+                while self.running:
+                    unix_server.handle_request()
+            finally:
+                os.unlink(path)
+
+    def serve(self, address: str):
+        """Serve requests on the Unix socket or stdin/stdout (`-`)"""
+        self.warm_up()
+        if address == "-":
+            self.serve_stream(sys.stdin, sys.stdout)
+        else:
+            self.serve_socket(address)
@@ -0,0 +1,177 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+from unittest import mock
+
+from jinja2 import DictLoader
+
+from codegenerator import base
+
+
+class DummyGenerator(base.BaseGenerator):
+    format_command = ["fmt"]
+
+    def generate(
+        self, res, target_dir, openapi_spec=None, operation_id=None, args=None
+    ):
+        pass
+
+
+class TestFormatCode(TestCase):
+    @mock.patch("subprocess.run")
+    def test_per_file(self, run_mock):
+        gen = DummyGenerator()
+        gen._format_code("a", "b")
+        run_mock.assert_has_calls(
+            [mock.call(["fmt", "a"]), mock.call(["fmt", "b"])]
+        )
+
+    @mock.patch("subprocess.run")
+    def test_batched(self, run_mock):
+        gen = DummyGenerator()
+        gen.format_mode = "batched"
+        gen.format_batch_size = 2
+        gen._format_code("a")
+        gen._format_code("b", "a")
+        gen._format_code("c")
+        run_mock.assert_not_called()
+        gen.flush_format_queue()
+        run_mock.assert_has_calls(
+            [mock.call(["fmt", "a", "b"]), mock.call(["fmt", "c"])]
+        )
+        self.assertEqual([], gen.format_queue)
+
+    @mock.patch("subprocess.run")
+    def test_none(self, run_mock):
+        gen = DummyGenerator()
+        gen.format_mode = "none"
+        gen._format_code("a")
+        gen.flush_format_queue()
+        run_mock.assert_not_called()
+
+
+class TestEnvironment(TestCase):
+    def test_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gen1 = DummyGenerator()
+            gen2 = DummyGenerator()
+            gen1.template_cache_dir = tmp
+            gen2.template_cache_dir = tmp
+            self.assertIs(gen1.env, gen2.env)
+            self.assertIsNot(gen1.env, base.get_environment())
+            self.assertIn("wrap_markdown", gen1.env.filters)
+            gen1.env.get_template("rust_macros.j2")
+            self.assertTrue(list(Path(tmp).iterdir()))
+
+    def test_rendered_templates(self):
+        env = base.TrackingEnvironment(
+            loader=DictLoader(
+                {
+                    "impl.j2": (
+                        "{% import 'macros.j2' as m %}{% include 'a.j2' %}"
+                        "{% if x %}{% include 'b.j2' %}{% endif %}"
+                    ),
+                    "macros.j2": "",
+                    "a.j2": "a",
+                    "b.j2": "b",
+                }
+            )
+        )
+        with mock.patch.object(DummyGenerator, "env", env):
+            gen = DummyGenerator()
+            gen._render("impl.j2", {"x": False}, "wrk", "foo.rs")
+            gen._render("impl.j2", {"x": True}, "wrk", "bar.rs")
+        self.assertEqual(
+            {
+                Path("wrk", "foo.rs"): ["a.j2", "impl.j2", "macros.j2"],
+                Path("wrk", "bar.rs"): [
+                    "a.j2",
+                    "b.j2",
+                    "impl.j2",
+                    "macros.j2",
+                ],
+            },
+            gen.rendered_templates,
+        )
+        self.assertIsNone(env.loaded)
+
+
+class TestRender(TestCase):
+    def test_format_staged(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gen = DummyGenerator()
+            gen.format_backend = "files"
+            gen.format_command = ["sed", "-i", "s/foo/bar/"]
+            path = Path(tmp, "a.rs")
+            gen.output.add(path, "foo")
+            gen._format_code(path)
+            # File is written once formatted
+            self.assertEqual("bar", path.read_text())
+            self.assertEqual({}, gen.output.pending)
+
+            gen.format_mode = "batched"
+            gen.output.add(path, "foo")
+            gen.output.add(Path(tmp, "b.rs"), "foo")
+            gen._format_code(path)
+            gen.flush_format_queue()
+            self.assertEqual("bar", path.read_text())
+            # Files which are not formatted are still written
+            self.assertEqual("foo", Path(tmp, "b.rs").read_text())
+            self.assertEqual(
+                {"new": 2, "changed": 0, "unchanged": 1}, gen.output.stats
+            )
+
+    def test_format_stdin(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gen = DummyGenerator()
+            gen.format_backend = "stdin"
+            gen.format_mode = "batched"
+            gen.format_stdin_command = ["sed", "s/foo/bar/"]
+            for name in ["a.rs", "b.rs"]:
+                gen.output.add(Path(tmp, name), "foo")
+                gen._format_code(Path(tmp, name))
+            gen.flush_format_queue()
+            for name in ["a.rs", "b.rs"]:
+                self.assertEqual("bar", Path(tmp, name).read_text())
+
+    def test_format_auto(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gen = DummyGenerator()
+            gen.format_command = ["sed", "-i", "s/foo/files/"]
+            gen.format_stdin_command = ["sed", "s/foo/stdin/"]
+            path = Path(tmp, "a.rs")
+            gen.output.add(path, "foo")
+            gen._format_code(path)
+            self.assertEqual("stdin", path.read_text())
+
+            gen.format_mode = "batched"
+            gen.output.add(path, "foo")
+            gen._format_code(path)
+            gen.flush_format_queue()
+            self.assertEqual("files", path.read_text())
+
+    def test_format_stdin_failure(self):
+        gen = DummyGenerator()
+        gen.format_stdin_command = ["false"]
+        self.assertEqual("foo", gen._format_content("foo"))
+
+    def test_format_api(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            gen = DummyGenerator()
+            gen.format_backend = "api"
+            path = Path(tmp, "a.py")
+            gen.output.add(path, "x  =  {'a':1}")
+            gen._format_code(path)
+            self.assertEqual('x = {"a": 1}\n', path.read_text())
@@ -0,0 +1,85 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+from pathlib import Path
+import tempfile
+from unittest import mock
+from unittest import TestCase
+
+from codegenerator import cache
+from codegenerator.types import OperationTargetParams
+
+
+class TestGenerationCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_path = Path(self.tmp.name, "cache.json")
+        self.out = Path(self.tmp.name, "out.rs")
+
+    def _key(self, gen_cache, format_backend="files", **kwargs):
+        return gen_cache.get_key(
+            "rust-sdk",
+            "wrk",
+            "op_hash",
+            OperationTargetParams(**kwargs),
+            "src_hash",
+            "per-file",
+            format_backend,
+        )
+
+    def test_key(self):
+        gen_cache = cache.GenerationCache(self.cache_path)
+        self.assertEqual(self._key(gen_cache), self._key(gen_cache))
+        self.assertNotEqual(
+            self._key(gen_cache), self._key(gen_cache, module_name="foo")
+        )
+        self.assertNotEqual(
+            self._key(gen_cache), self._key(gen_cache, format_backend="api")
+        )
+
+    def test_hit_and_miss(self):
+        gen_cache = cache.GenerationCache(self.cache_path)
+        key = self._key(gen_cache)
+        self.assertIsNone(gen_cache.get(key))
+        self.out.write_text("foo")
+        gen_cache.set(key, [(["a", "v1"], "get", "/v1/a")], [self.out], {})
+        gen_cache.save()
+
+        gen_cache = cache.GenerationCache(self.cache_path)
+        self.assertEqual([(["a", "v1"], "get", "/v1/a")], gen_cache.get(key))
+        # Output modified outside of the generator
+        self.out.write_text("bar")
+        self.assertIsNone(gen_cache.get(key))
+        self.assertEqual((1, 1), (gen_cache.hits, gen_cache.misses))
+
+    def test_template_modified(self):
+        templates_dir = Path(self.tmp.name, "templates")
+        templates_dir.mkdir()
+        template = Path(templates_dir, "impl.j2")
+        template.write_text("{{ foo }}")
+        self.out.write_text("foo")
+        with mock.patch.object(cache, "TEMPLATES_DIR", templates_dir):
+            gen_cache = cache.GenerationCache(None)
+            key = self._key(gen_cache)
+            gen_cache.set(key, [], [self.out], {self.out: ["impl.j2"]})
+            gen_cache.save()
+            self.assertFalse(self.cache_path.exists())
+            self.assertEqual([], gen_cache.get(key))
+            self.assertEqual(
+                {self.out: ["impl.j2"]}, gen_cache.get_rendered_templates(key)
+            )
+
+            template.write_text("{{ bar }}")
+            gen_cache.save()
+            self.assertIsNone(gen_cache.get(key))
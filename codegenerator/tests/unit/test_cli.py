@@ -0,0 +1,183 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+import argparse
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from codegenerator import cli
+from codegenerator import manifest
+
+
+class TestMetadataFiles(TestCase):
+    def test_get_metadata_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in [
+                "compute_metadata.yaml",
+                "block-storage_metadata.yaml",
+                "README.rst",
+                "network.yaml",
+            ]:
+                Path(tmp, name).touch()
+            self.assertEqual(
+                {
+                    "block-storage": Path(tmp, "block-storage_metadata.yaml"),
+                    "compute": Path(tmp, "compute_metadata.yaml"),
+                },
+                cli.get_metadata_files(Path(tmp)),
+            )
+            self.assertEqual(
+                {"compute": Path(tmp, "compute_metadata.yaml")},
+                cli.get_metadata_files(Path(tmp), ["compute", "image"]),
+            )
+
+
+class TestLazyImports(TestCase):
+    def test_heavy_modules_not_imported(self):
+        heavy = ["openstack", "sphinx", "openapi_core", "mdformat", "jinja2"]
+        heavy.extend(x.split(":")[0] for x in cli.GENERATORS.values())
+        proc = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, codegenerator.cli; print(' '.join(sys.modules))",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imported = set(proc.stdout.split())
+        self.assertEqual([], [x for x in heavy if x in imported])
+
+    def test_get_generator_class(self):
+        from codegenerator.rust_sdk import RustSdkGenerator
+
+        self.assertIs(RustSdkGenerator, cli.get_generator_class("rust-sdk"))
+
+
+class TestGenerator(TestCase):
+    def test_drop_changed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp, "metadata.yaml")
+            path.write_text("resources: {}\n")
+            generator = cli.Generator()
+            generator.load_metadata(path)
+            metadata = generator.metadata
+            self.assertEqual([], generator.drop_changed())
+            generator.load_metadata(path)
+            self.assertIs(metadata, generator.metadata)
+
+            path.write_text("resources: {}\n\n")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual([path.as_posix()], generator.drop_changed())
+            generator.load_metadata(path)
+            self.assertIsNot(metadata, generator.metadata)
+
+
+class TestPruneOutputs(TestCase):
+    def test_prune_outputs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            work_dir = Path(tmp, "wrk")
+            kept = Path(work_dir, "v1", "foo.rs")
+            stale = [
+                Path(work_dir, "v1", "bar.rs"),
+                Path(work_dir, "v1", "bar", "get.rs"),
+            ]
+            outside = Path(tmp, "outside.rs")
+            for path in [kept, outside, *stale]:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.touch()
+            cli.prune_outputs(
+                [x.as_posix() for x in [*stale, outside, kept]],
+                work_dir.as_posix(),
+                # Same file given through the other spelling of the path
+                [Path(work_dir, "v1", "..", "v1", "foo.rs").as_posix()],
+            )
+            self.assertTrue(kept.exists())
+            self.assertTrue(outside.exists())
+            self.assertFalse(Path(work_dir, "v1", "bar").exists())
+            self.assertFalse(stale[0].exists())
+
+
+class TestMetadataManifest(TestCase):
+    def test_work_dir_spelling(self):
+        """Outputs are matched no matter how the work dir is given"""
+        self.addCleanup(os.chdir, os.getcwd())
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            metadata = Path("metadata.yaml")
+            metadata.touch()
+            Path("out").mkdir()
+            for name in ["a.rs", "b.rs"]:
+                Path("out", name).write_text(name)
+            runs = [
+                ("out", ["a.rs", "b.rs"], False),
+                # Check mode of the run with `b.rs` not produced anymore
+                (Path(tmp, "out").resolve().as_posix(), ["a.rs"], True),
+            ]
+            stale = {}
+            for work_dir, names, check in runs:
+                args = argparse.Namespace(
+                    target=["rust-sdk"],
+                    resource=None,
+                    no_prune=False,
+                    check=check,
+                )
+                generated = manifest.Manifest(work_dir)
+                generated.add_outputs(
+                    "rust-sdk",
+                    {Path(work_dir, name): [] for name in names},
+                    metadata=generated.get_relative_path(metadata),
+                    service="compute",
+                )
+                stale = cli.write_metadata_manifest(
+                    Path(work_dir, manifest.MANIFEST_NAME),
+                    generated,
+                    args,
+                    {"compute": metadata},
+                )
+        self.assertEqual(["b.rs"], list(stale))
+
+
+class TestCheckMode(TestCase):
+    def get_args(self, **kwargs) -> argparse.Namespace:
+        return argparse.Namespace(
+            check=True,
+            format_mode="none",
+            format_backend="auto",
+            cache_dir=None,
+            **kwargs,
+        )
+
+    def test_direct_writes_rejected(self):
+        with self.assertRaises(RuntimeError):
+            cli.get_code_generator("openapi-spec", self.get_args())
+
+    def test_metadata_not_written(self):
+        spec = Path(
+            cli.__file__, "..", "..", "static", "openapi_specs"
+        ).resolve()
+        with tempfile.TemporaryDirectory() as tmp:
+            args = self.get_args(
+                openapi_yaml_spec=Path(spec, "object-store", "v1.yaml"),
+                service_type="object-store",
+            )
+            generator = cli.get_code_generator("metadata", args)
+            generator.generate(None, tmp, args=args)
+            generator.flush_format_queue()
+            path = Path(tmp, "object-store_metadata.yaml")
+            self.assertFalse(path.exists())
+            self.assertEqual([path], list(generator.output.diffs))
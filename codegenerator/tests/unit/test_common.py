@@ -10,10 +10,19 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import copy
+import json
+import os
+from pathlib import Path
+import pickle
+import tempfile
+from unittest import mock
 from unittest import TestCase
 
 from typing import Any
 
+import jsonref
+
 from codegenerator import common
 
 
@@ -146,3 +155,191 @@ class TestFindResponseSchema(TestCase):
         }
         for singular, plural in map.items():
             self.assertEqual(singular, common.get_singular_form(plural))
+
+
+class TestOpenAPISpec(TestCase):
+    SPEC = {
+        "paths": {
+            "/v2/foos": {
+                "parameters": [],
+                "get": {"operationId": "foos:get"},
+                "post": {"operationId": "foos:post"},
+            },
+            "/v2/foos/{id}": {
+                "get": {"operationId": "foos/id:get"},
+                "delete": {"operationId": "foos:post"},
+            },
+        }
+    }
+
+    def test_get_operation(self):
+        spec = common.OpenAPISpec(self.SPEC)
+        self.assertEqual(
+            ("/v2/foos/{id}", "get", {"operationId": "foos/id:get"}),
+            spec.get_operation("foos/id:get"),
+        )
+        # First occurence wins
+        self.assertEqual(
+            ("/v2/foos", "post", {"operationId": "foos:post"}),
+            spec.get_operation("foos:post"),
+        )
+        self.assertEqual(
+            spec.get_operation("foos:get"),
+            common.find_openapi_operation(self.SPEC, "foos:get"),
+        )
+
+    def test_get_operation_missing(self):
+        spec = common.OpenAPISpec(self.SPEC)
+        with self.assertRaises(RuntimeError):
+            spec.get_operation("bars:get")
+
+
+class TestSpecCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.spec_path = Path(self.tmp.name, "spec.yaml")
+        self.spec_path.write_text("openapi: 3.1.0\npaths: {}\n")
+        self.cache_path = common._get_spec_cache_path(
+            self.spec_path, self.tmp.name
+        )
+
+    def test_cache(self):
+        self.assertIsNone(
+            common._load_cached_spec(self.spec_path, self.cache_path)
+        )
+        common._save_cached_spec(
+            self.spec_path, self.cache_path, {"paths": {}}
+        )
+        self.assertEqual(
+            {"paths": {}},
+            common._load_cached_spec(self.spec_path, self.cache_path),
+        )
+
+    def test_cache_header_refreshed(self):
+        common._save_cached_spec(
+            self.spec_path, self.cache_path, {"paths": {}}
+        )
+        # Same content with a different modification time
+        stat = self.spec_path.stat()
+        os.utime(
+            self.spec_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9)
+        )
+        self.assertEqual(
+            {"paths": {}},
+            common._load_cached_spec(self.spec_path, self.cache_path),
+        )
+        with open(self.cache_path, "rb") as fp:
+            header = pickle.load(fp)
+        self.assertEqual(
+            common._get_spec_file_info(self.spec_path), header["file"]
+        )
+        # Content is not hashed again
+        with mock.patch.object(common.hashlib, "md5") as md5:
+            self.assertEqual(
+                {"paths": {}},
+                common._load_cached_spec(self.spec_path, self.cache_path),
+            )
+            md5.assert_not_called()
+
+    def test_cache_invalidated(self):
+        common._save_cached_spec(
+            self.spec_path, self.cache_path, {"paths": {}}
+        )
+        self.spec_path.write_text("openapi: 3.1.0\npaths: {'/': {}}\n")
+        self.assertIsNone(
+            common._load_cached_spec(self.spec_path, self.cache_path)
+        )
+
+
+class TestLazyRefs(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.document: dict[str, Any] = {
+            "paths": {
+                "/foo": {
+                    "get": {
+                        "parameters": [
+                            {"$ref": "#/components/parameters/limit"}
+                        ],
+                        "responses": {
+                            "200": {"$ref": "#/components/responses/foo"}
+                        },
+                    }
+                }
+            },
+            "components": {
+                "parameters": {"limit": {"name": "limit", "in": "query"}},
+                "responses": {
+                    "foo": {
+                        "content": {
+                            "application/json": {
+                                "schema": {"$ref": "#/components/schemas/foo"}
+                            }
+                        }
+                    }
+                },
+                "schemas": {"foo": {"type": "object"}},
+            },
+        }
+
+    def test_resolve(self):
+        data = common.refs.replace_refs_lazy(self.document)
+        operation = data["paths"]["/foo"]["get"]
+        self.assertEqual(
+            {"name": "limit", "in": "query"}, operation["parameters"][0]
+        )
+        self.assertEqual(
+            {"type": "object"},
+            operation["responses"]["200"]["content"]["application/json"][
+                "schema"
+            ],
+        )
+        # Same reference is resolved to the same object
+        self.assertIs(
+            data["components"]["schemas"]["foo"],
+            operation["responses"]["200"]["content"]["application/json"][
+                "schema"
+            ],
+        )
+        # Original document is not modified
+        self.assertEqual(
+            {"$ref": "#/components/parameters/limit"},
+            self.document["paths"]["/foo"]["get"]["parameters"][0],
+        )
+
+    def test_same_as_eager(self):
+        data = common.refs.replace_refs_lazy(self.document)
+        eager = jsonref.replace_refs(
+            copy.deepcopy(self.document), proxies=False
+        )
+        self.assertEqual(json.dumps(eager), json.dumps(data))
+        self.assertEqual(eager, copy.deepcopy(data))
+        self.assertEqual(dict(**eager["paths"]), dict(**data["paths"]))
+
+    def test_deepcopy_recursive(self):
+        document = {
+            "components": {
+                "schemas": {
+                    "node": {
+                        "type": "object",
+                        "properties": {
+                            "children": {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/node"},
+                            }
+                        },
+                    }
+                }
+            }
+        }
+        data = copy.deepcopy(common.refs.replace_refs_lazy(document))
+        node = data["components"]["schemas"]["node"]
+        self.assertNotIsInstance(node, common.refs.LazyRefDict)
+        self.assertIs(node, node["properties"]["children"]["items"])
+
+    def test_remote_ref(self):
+        data = common.refs.replace_refs_lazy({"a": {"$ref": "foo.yaml#/a"}})
+        with self.assertRaises(NotImplementedError):
+            data["a"]
@@ -0,0 +1,116 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from jinja2 import DictLoader
+from jinja2 import Environment
+
+from codegenerator import manifest
+
+
+class TestManifest(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.env = Environment(
+            loader=DictLoader(
+                {
+                    "impl.j2": (
+                        "{% import 'macros.j2' as m %}{% include 'a.j2' %}"
+                        "{% include name %}"
+                    ),
+                    "macros.j2": "",
+                    "a.j2": "a",
+                }
+            )
+        )
+
+    def test_get_template_includes(self):
+        self.assertEqual(
+            ["a.j2", "macros.j2"],
+            manifest.get_template_includes(self.env, "impl.j2"),
+        )
+        self.assertEqual([], manifest.get_template_includes(self.env, "a.j2"))
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp, "foo.rs")
+            out.write_text("foo")
+            generated = manifest.Manifest(tmp)
+            generated.add_outputs(
+                "rust-sdk", {out: ["a.j2", "impl.j2"]}, operation_id="op"
+            )
+            generated.add_templates(self.env)
+            path = Path(tmp, "manifest.json")
+            generated.write(path)
+            loaded = manifest.Manifest.load(path, tmp)
+        output = loaded.outputs["foo.rs"]
+        self.assertEqual("rust-sdk", output["target"])
+        self.assertEqual("op", output["operation_id"])
+        self.assertEqual(["a.j2", "impl.j2"], output["templates"])
+        self.assertEqual("acbd18db4cc2f85cedef654fccc4a4d8", output["hash"])
+        self.assertEqual(["a.j2", "impl.j2"], sorted(loaded.templates))
+        self.assertEqual(
+            ["a.j2", "macros.j2"], loaded.templates["impl.j2"]["includes"]
+        )
+
+    def test_relative_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            generated = manifest.Manifest(Path(tmp, "wrk", "..", "out"))
+            for path in [
+                Path(tmp, "out", "a", "b.rs"),
+                Path(tmp, "out", "a", "..", "a", "b.rs"),
+            ]:
+                self.assertEqual("a/b.rs", generated.get_relative_path(path))
+            self.assertEqual(
+                "../metadata.yaml",
+                generated.get_relative_path(Path(tmp, "metadata.yaml")),
+            )
+            self.assertEqual(
+                Path(tmp, "out", "a", "b.rs").resolve(),
+                generated.get_path("a/b.rs").resolve(),
+            )
+
+    def test_load_other_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp, "manifest.json")
+            path.write_text('{"outputs": {"a.rs": {}}, "templates": {}}')
+            self.assertEqual({}, manifest.Manifest.load(path).outputs)
+
+    def test_merge(self):
+        previous = manifest.Manifest()
+        previous.outputs = {
+            "compute/a.rs": {"target": "rust-sdk", "service": "compute"},
+            "compute/b.rs": {"target": "rust-sdk", "service": "compute"},
+            "network/a.rs": {"target": "rust-sdk", "service": "network"},
+        }
+        generated = manifest.Manifest()
+        generated.outputs = {
+            "compute/a.rs": {"target": "rust-sdk", "service": "compute"}
+        }
+        stale = generated.merge(previous, lambda x: x["service"] == "compute")
+        self.assertEqual(["compute/b.rs"], list(stale))
+        self.assertEqual(
+            ["compute/a.rs", "network/a.rs"], sorted(generated.outputs)
+        )
+        generated.merge(
+            previous, lambda x: x["service"] == "compute", keep_stale=True
+        )
+        self.assertIn("compute/b.rs", generated.outputs)
+
+    def test_load_missing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(
+                {}, manifest.Manifest.load(Path(tmp, "missing")).outputs
+            )
@@ -10,7 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 #
+import copy
 import logging
+from typing import Any
+from typing import cast
+from unittest import mock
 from unittest import TestCase
 
 from codegenerator import model
@@ -422,18 +426,15 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format="uuid"),
             model.ConstraintString(maxLength=0),
         ],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="flavorRef", type=model.OneOfType),
         kinds=[model.ConstraintString(minLength=1), model.ConstraintInteger()],
-        min_ver="2.94",
     ),
     model.Dictionary(
         reference=model.Reference(name="metadata", type=model.Dictionary),
         description="metadata description",
         value_type=model.ConstraintString(maxLength=255),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="fixed_ip", type=model.OneOfType),
@@ -441,12 +442,10 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format="ipv4"),
             model.ConstraintString(format="ipv6"),
         ],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="port", type=model.OneOfType),
         kinds=[model.ConstraintString(format="uuid"), model.PrimitiveNull()],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(name="networks", type=model.Struct),
@@ -468,12 +467,10 @@ EXPECTED_DATA_TYPES = [
                 )
             ),
         },
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="networks", type=model.Array),
         item_type=model.Reference(name="networks", type=model.Struct),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="networks", type=model.OneOfType),
@@ -481,13 +478,11 @@ EXPECTED_DATA_TYPES = [
             model.Reference(name="networks", type=model.Array),
             model.Reference(name="networks", type=model.Enum),
         ],
-        min_ver="2.94",
     ),
     model.Enum(
         reference=model.Reference(name="networks", type=model.Enum),
         literals=["none", "auto"],
         base_types=[model.ConstraintString],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="volume_size", type=model.OneOfType),
@@ -495,7 +490,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintInteger(minimum=1, maximum=2147483647),
             model.ConstraintString(pattern="^[0-9]+$"),
         ],
-        min_ver="2.94",
     ),
     # model.OneOfType(
     #    reference=model.Reference(
@@ -512,7 +506,6 @@ EXPECTED_DATA_TYPES = [
         ),
         literals=[True, "True", False, "False"],
         base_types=[model.ConstraintString, model.PrimitiveBoolean],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(
@@ -548,7 +541,6 @@ EXPECTED_DATA_TYPES = [
                 data_type=model.ConstraintString(maxLength=16777215)
             ),
         },
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="volume_size", type=model.OneOfType),
@@ -556,7 +548,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintInteger(minimum=1, maximum=2147483647),
             model.ConstraintString(pattern="^[0-9]+$"),
         ],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="boot_index", type=model.OneOfType),
@@ -565,7 +556,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(pattern="^-?[0-9]+$"),
             model.PrimitiveNull(),
         ],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="volume_type", type=model.OneOfType),
@@ -573,7 +563,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(minLength=0, maxLength=255),
             model.PrimitiveNull(),
         ],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(
@@ -649,7 +638,6 @@ EXPECTED_DATA_TYPES = [
                 )
             ),
         },
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(
@@ -658,7 +646,6 @@ EXPECTED_DATA_TYPES = [
         item_type=model.Reference(
             name="block_device_mapping", type=model.Struct
         ),
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(
@@ -667,13 +654,11 @@ EXPECTED_DATA_TYPES = [
         item_type=model.Reference(
             name="block_device_mapping_v2", type=model.Struct
         ),
-        min_ver="2.94",
     ),
     model.Enum(
         reference=model.Reference(name="config_drive", type=model.Enum),
         base_types=[model.PrimitiveBoolean, model.ConstraintString],
         literals={"No", "no", False},
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="min_count", type=model.OneOfType),
@@ -681,7 +666,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintInteger(minimum=1),
             model.ConstraintString(minLength=1, pattern="^[0-9]*$"),
         ],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(name="security_groups", type=model.Struct),
@@ -693,12 +677,10 @@ EXPECTED_DATA_TYPES = [
                 description="A target cell name. Schedule the server in a host in the cell specified.",
             )
         },
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="security_groups", type=model.Array),
         item_type=model.Reference(name="security_groups", type=model.Struct),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="description", type=model.OneOfType),
@@ -708,21 +690,18 @@ EXPECTED_DATA_TYPES = [
             ),
             model.PrimitiveNull(),
         ],
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="tags", type=model.Array),
         item_type=model.ConstraintString(
             format=None, minLength=1, maxLength=60, pattern="^[^,/]*$"
         ),
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(
             name="trusted_image_certificates", type=model.Array
         ),
         item_type=model.ConstraintString(format=None, minLength=1),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(
@@ -734,7 +713,6 @@ EXPECTED_DATA_TYPES = [
             ),
             model.PrimitiveNull(),
         ],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(name="server", type=model.Struct),
@@ -872,12 +850,10 @@ EXPECTED_DATA_TYPES = [
                 min_ver="2.94",
             ),
         },
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="different_host", type=model.Array),
         item_type=model.ConstraintString(format="uuid"),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="different_host", type=model.OneOfType),
@@ -885,12 +861,10 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format="uuid"),
             model.Reference(name="different_host", type=model.Array),
         ],
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="same_host", type=model.Array),
         item_type=model.ConstraintString(format="uuid"),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="same_host", type=model.OneOfType),
@@ -898,12 +872,10 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format=None),
             model.Reference(name="same_host", type=model.Array),
         ],
-        min_ver="2.94",
     ),
     model.Dictionary(
         reference=model.Reference(name="query", type=model.Dictionary),
         value_type=model.PrimitiveAny(),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="query", type=model.OneOfType),
@@ -911,12 +883,10 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format=None),
             model.Reference(name="query", type=model.Dictionary),
         ],
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="different_cell", type=model.Array),
         item_type=model.ConstraintString(format=None),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="different_cell", type=model.OneOfType),
@@ -924,7 +894,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format=None),
             model.Reference(name="different_cell", type=model.Array),
         ],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(
@@ -934,7 +903,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format="ipv4"),
             model.ConstraintString(format="ipv6"),
         ],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(
@@ -987,12 +955,10 @@ EXPECTED_DATA_TYPES = [
             ),
         },
         additional_fields=model.PrimitiveAny(),
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="different_host", type=model.Array),
         item_type=model.ConstraintString(format="uuid"),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="different_host", type=model.OneOfType),
@@ -1000,12 +966,10 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format="uuid"),
             model.Reference(name="different_host", type=model.Array),
         ],
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="same_host", type=model.Array),
         item_type=model.ConstraintString(format="uuid"),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="same_host", type=model.OneOfType),
@@ -1013,12 +977,10 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format=None),
             model.Reference(name="same_host", type=model.Array),
         ],
-        min_ver="2.94",
     ),
     model.Array(
         reference=model.Reference(name="different_cell", type=model.Array),
         item_type=model.ConstraintString(format=None),
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(name="different_cell", type=model.OneOfType),
@@ -1026,25 +988,21 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format=None),
             model.Reference(name="different_cell", type=model.Array),
         ],
-        min_ver="2.94",
     ),
     model.Enum(
         reference=model.Reference(name="source_type", type=model.Enum),
         literals={"volume", "image", "snapshot", "blank"},
         base_types=[model.ConstraintString],
-        min_ver="2.94",
     ),
     model.Enum(
         reference=model.Reference(name="destination_type", type=model.Enum),
         literals={"volume", "local"},
         base_types=[model.ConstraintString],
-        min_ver="2.94",
     ),
     model.Enum(
         reference=model.Reference(name="OS-DCF:diskConfig", type=model.Enum),
         literals={"AUTO", "MANUAL"},
         base_types=[model.ConstraintString],
-        min_ver="2.94",
     ),
     model.OneOfType(
         reference=model.Reference(
@@ -1054,7 +1012,6 @@ EXPECTED_DATA_TYPES = [
             model.ConstraintString(format="ipv4"),
             model.ConstraintString(format="ipv6"),
         ],
-        min_ver="2.94",
     ),
     model.Struct(
         reference=model.Reference(
@@ -1105,7 +1062,6 @@ EXPECTED_DATA_TYPES = [
             ),
         },
         additional_fields=model.PrimitiveAny(),
-        min_ver="2.94",
     ),
     EXPECTED_TLA_DATA,
 ]
@@ -1142,9 +1098,9 @@ class TestModel(TestCase):
         }
         parser = model.OpenAPISchemaParser()
         res = parser.parse_parameter(schema)
-        dt = res.data_type
         self.assertIsInstance(res, model.RequestParameter)
-        self.assertIsInstance(dt, model.ConstraintString)
+        self.assertIsInstance(res.data_type, model.ConstraintString)
+        dt = cast(model.ConstraintString, res.data_type)
         self.assertEqual("regex", dt.format)
         self.assertEqual("query", res.location)
         self.assertEqual("tags", res.name)
@@ -1159,9 +1115,9 @@ class TestModel(TestCase):
         }
         parser = model.OpenAPISchemaParser()
         res = parser.parse_parameter(schema)
-        dt = res.data_type
         self.assertIsInstance(res, model.RequestParameter)
-        self.assertIsInstance(dt, model.CommaSeparatedList)
+        self.assertIsInstance(res.data_type, model.CommaSeparatedList)
+        dt = cast(model.CommaSeparatedList, res.data_type)
         self.assertIsInstance(dt.item_type, model.ConstraintString)
 
     def test_parse_limit_multitype_parameter(self):
@@ -1176,11 +1132,23 @@ class TestModel(TestCase):
         }
         parser = model.OpenAPISchemaParser()
         res = parser.parse_parameter(schema)
-        dt = res.data_type
         self.assertIsInstance(res, model.RequestParameter)
-        self.assertIsInstance(dt, model.ConstraintInteger)
+        self.assertIsInstance(res.data_type, model.ConstraintInteger)
+        dt = cast(model.ConstraintInteger, res.data_type)
         self.assertEqual(dt.minimum, 0)
 
+    def test_parse_nullable_parameter(self):
+        schema: dict[str, Any] = {
+            "in": "header",
+            "name": "X-Meta-*",
+            "schema": {"type": ["string", "null"]},
+        }
+        parser = model.OpenAPISchemaParser()
+        res = parser.parse_parameter(schema)
+        self.assertIsInstance(res.data_type, model.ConstraintString)
+        # Spec is not modified
+        self.assertEqual(["string", "null"], schema["schema"]["type"])
+
     # def test_microversion(self):
     #     data: dict | None = None
     #     with open(
@@ -1256,3 +1224,203 @@ class TestModel(TestCase):
         parser = model.OpenAPISchemaParser()
         (res, all_models) = parser.parse(schema)
         self.assertEqual(4, len(all_models))
+
+    def test_parse_does_not_modify_schema(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "foo": {
+                    "type": ["object"],
+                    "properties": {"bar": {"type": ["string"]}},
+                },
+                "baz": {"type": ["string", "null"]},
+            },
+        }
+        expected = copy.deepcopy(schema)
+        hash_ = model.StructuralHasher().hash(schema)
+        model.OpenAPISchemaParser().parse(schema)
+        self.assertEqual(expected, schema)
+        self.assertEqual(hash_, model.StructuralHasher().hash(schema))
+
+    def test_structural_hash(self):
+        nested = {"type": "object", "properties": {"a": {"type": "string"}}}
+        schema = {
+            "type": "object",
+            "properties": {"foo": nested, "bar": [nested, 1, "1", None]},
+        }
+        hasher = model.StructuralHasher()
+        hash_ = hasher.hash(schema)
+        # Nested schema is hashed once and cached by identity
+        self.assertIn(id(nested), hasher.cache)
+        self.assertEqual(hash_, model.StructuralHasher().hash(schema))
+        # Equal structure results in equal hash
+        self.assertEqual(
+            hash_,
+            model.StructuralHasher().hash(
+                {
+                    "properties": {
+                        "bar": [dict(nested), 1, "1", None],
+                        "foo": dict(nested),
+                    },
+                    "type": "object",
+                }
+            ),
+        )
+        # Different values or types result in different hash
+        for other in [
+            {"type": "object", "properties": {"foo": nested}},
+            {
+                "type": "object",
+                "properties": {"foo": nested, "bar": [nested, "1", 1, None]},
+            },
+            {
+                "type": "object",
+                "properties": {"foo": [nested], "bar": [nested, 1, "1", None]},
+            },
+        ]:
+            self.assertNotEqual(hash_, model.StructuralHasher().hash(other))
+
+    def test_parse_cache(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "foo": {
+                    "type": "object",
+                    "properties": {"bar": {"type": "string"}},
+                }
+            },
+        }
+        parse_cache: dict = {}
+        (res1, models1) = model.OpenAPISchemaParser(
+            parse_cache=parse_cache
+        ).parse(schema)
+        (res2, models2) = model.OpenAPISchemaParser(
+            parse_cache=parse_cache
+        ).parse(schema)
+        # Root and the nested object
+        self.assertEqual(2, len(parse_cache))
+        self.assertEqual(models1, models2)
+        self.assertEqual(res1, res2)
+        # Every consumer gets own copy of the models
+        self.assertIsNot(models1[0], models2[0])
+        models1[0].fields.pop("bar")
+        self.assertIn("bar", models2[0].fields)
+        # Parsing with different flags is not served from the cache
+        model.OpenAPISchemaParser(parse_cache=parse_cache).parse(
+            schema, ignore_read_only=True
+        )
+        self.assertEqual(4, len(parse_cache))
+        # Structurally equal schema (i.e. of another operation) is not parsed
+        # again
+        parser = model.OpenAPISchemaParser(parse_cache=parse_cache)
+        with mock.patch.object(
+            parser, "_parse_object", wraps=parser._parse_object
+        ) as parse_object:
+            (res3, _) = parser.parse(copy.deepcopy(schema))
+            parse_object.assert_not_called()
+            self.assertEqual(res1, res3)
+            # Only the modified root is parsed
+            parser.parse({**schema, "description": "foo"})
+            self.assertEqual(1, parse_object.call_count)
+        self.assertEqual(5, len(parse_cache))
+
+    def test_parse_cache_nested(self):
+        """Subschema shared by different bodies is parsed once"""
+        body1: dict[str, Any] = copy.deepcopy(SAMPLE_SERVER_SCHEMA)
+        body2: dict[str, Any] = copy.deepcopy(SAMPLE_SERVER_SCHEMA)
+        body2["properties"].pop("os:scheduler_hints")
+        body2["properties"]["foo"] = {"type": "string"}
+        parse_cache: dict = {}
+        model.OpenAPISchemaParser(parse_cache=parse_cache).parse(body1)
+        parser = model.OpenAPISchemaParser(parse_cache=parse_cache)
+        with mock.patch.object(
+            parser, "_parse_object", wraps=parser._parse_object
+        ) as parse_object:
+            (root, models) = parser.parse(body2)
+        # Only the root of the second body is parsed
+        self.assertEqual(
+            [None], [x.kwargs["name"] for x in parse_object.call_args_list]
+        )
+        (expected_root, expected_models) = model.OpenAPISchemaParser().parse(
+            body2
+        )
+        self.assertEqual(expected_root, root)
+        self.assertEqual(expected_models, models)
+        # References of the reused models are linked with each other
+        refs = {x.reference.name: x.reference for x in models if x.reference}
+        self.assertIs(refs["server"], root.fields["server"].data_type)
+        self.assertIs(refs["server"], refs["metadata"].parent)
+
+    def test_parse_cache_renamed(self):
+        """Cached subtree is not reused when its models would be renamed"""
+        bar = {
+            "type": "object",
+            "properties": {
+                "links": {
+                    "type": "object",
+                    "properties": {"rel": {"type": "string"}},
+                }
+            },
+        }
+        links = {"type": "object", "properties": {"href": {"type": "string"}}}
+        parse_cache: dict = {}
+        model.OpenAPISchemaParser(parse_cache=parse_cache).parse(
+            {"type": "object", "properties": {"bar": bar}}
+        )
+        # `links` of `bar` collides with the already parsed `links`
+        schema = {
+            "type": "object",
+            "properties": {"links": links, "bar": copy.deepcopy(bar)},
+        }
+        (root, models) = model.OpenAPISchemaParser(
+            parse_cache=parse_cache
+        ).parse(schema)
+        (expected_root, expected_models) = model.OpenAPISchemaParser().parse(
+            schema
+        )
+        self.assertEqual(expected_root, root)
+        self.assertEqual(expected_models, models)
+        self.assertIn(
+            "bar_links", [x.reference.name for x in models if x.reference]
+        )
+
+    def test_parse_variants(self):
+        """Identical subtrees of the microversion variants are parsed once"""
+        variants = []
+        for min_ver in ["2.1", "2.19", "2.100"]:
+            variant: dict[str, Any] = copy.deepcopy(SAMPLE_SERVER_SCHEMA)
+            variant["x-openstack"] = {"min-ver": min_ver}
+            variants.append(variant)
+        variants[2]["properties"]["os:scheduler_hints"]["properties"].pop(
+            "group"
+        )
+        parser = model.OpenAPISchemaParser(parse_cache={})
+        with mock.patch.object(
+            parser, "_parse_object", wraps=parser._parse_object
+        ) as parse_object:
+            results = [
+                parser.parse(x, ignore_read_only=True) for x in variants
+            ]
+        self.assertEqual(
+            1,
+            [x.kwargs["name"] for x in parse_object.call_args_list].count(
+                "server"
+            ),
+        )
+        # Variants are parsed exactly as separately
+        for schema, (root, models) in zip(variants, results):
+            (expected_root, expected_models) = (
+                model.OpenAPISchemaParser().parse(schema, ignore_read_only=True)
+            )
+            self.assertEqual(expected_root, root)
+            self.assertEqual(expected_models, models)
+        # Inherited microversion is stamped into the fields of every variant
+        self.assertEqual(
+            ["2.1", "2.19", "2.100"],
+            [
+                next(x for x in models if x.reference.name == "server")
+                .fields["name"]
+                .min_ver
+                for (_, models) in results
+            ],
+        )
@@ -0,0 +1,92 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+import os
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from codegenerator import output
+
+
+class TestOutputSink(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name, "foo", "bar.rs")
+
+    def test_commit(self):
+        sink = output.OutputSink()
+        sink.add(self.path, "foo")
+        self.assertEqual([self.path], sink.get_pending(self.path.parent))
+        self.assertEqual("new", sink.commit(self.path))
+        self.assertEqual("foo", self.path.read_text())
+        self.assertEqual({}, sink.pending)
+
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual("unchanged", sink.commit(self.path, "foo"))
+        # Unchanged file is not touched
+        self.assertEqual(0, self.path.stat().st_mtime_ns)
+
+        sink.add(self.path, "foo")
+        self.assertEqual("changed", sink.commit(self.path, "bar"))
+        self.assertEqual("bar", self.path.read_text())
+        self.assertEqual({"new": 1, "changed": 1, "unchanged": 1}, sink.stats)
+        # No temporary files are left
+        self.assertEqual([self.path], list(self.path.parent.iterdir()))
+
+    def test_commit_mode(self):
+        sink = output.OutputSink()
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        sink.commit(self.path, "foo")
+        self.assertEqual(0o644, self.path.stat().st_mode & 0o777)
+        # Permissions of the existing file are kept
+        self.path.chmod(0o600)
+        sink.commit(self.path, "bar")
+        self.assertEqual(0o600, self.path.stat().st_mode & 0o777)
+
+    def test_commit_all(self):
+        sink = output.OutputSink()
+        sink.add(self.path, "foo")
+        sink.add(Path(self.tmp.name, "baz.rs"), "baz")
+        sink.commit_all()
+        self.assertEqual({}, sink.pending)
+        self.assertEqual(2, sink.stats["new"])
+
+    def test_commit_not_rendered(self):
+        sink = output.OutputSink()
+        with self.assertRaises(RuntimeError):
+            sink.commit(self.path)
+
+    def test_commit_dry_run(self):
+        sink = output.OutputSink()
+        sink.dry_run = True
+        self.assertEqual("new", sink.commit(self.path, "foo\n"))
+        self.assertFalse(self.path.exists())
+        self.assertIn("+foo", sink.diffs[self.path])
+
+        self.path.parent.mkdir()
+        self.path.write_text("foo\n")
+        sink.diffs.clear()
+        self.assertEqual("unchanged", sink.commit(self.path, "foo\n"))
+        self.assertEqual("changed", sink.commit(self.path, "bar\n"))
+        self.assertEqual("foo\n", self.path.read_text())
+        self.assertEqual(
+            f"--- a/{self.path.as_posix()}\n"
+            f"+++ b/{self.path.as_posix()}\n"
+            "@@ -1 +1 @@\n"
+            "-foo\n"
+            "+bar\n",
+            sink.diffs[self.path],
+        )
@@ -0,0 +1,69 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+from unittest import TestCase
+
+from codegenerator import profiling
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(profiling.disable)
+
+    def test_disabled(self):
+        @profiling.timed("foo")
+        def foo():
+            return 1
+
+        self.assertEqual(1, foo())
+        with profiling.phase("bar"), profiling.operation("op"):
+            pass
+        self.assertIsNone(profiling.get_profiler())
+
+    def test_phases(self):
+        profiler = profiling.enable()
+
+        @profiling.timed("foo")
+        def foo(recurse=False):
+            if recurse:
+                foo()
+            return 1
+
+        with profiling.operation("op1"):
+            foo(recurse=True)
+            with profiling.phase("bar"):
+                pass
+        foo()
+        data = profiler.get_data()
+        # Nested invocation of the same phase is not counted
+        self.assertEqual(2, data["phases"]["foo"]["count"])
+        self.assertEqual(1, data["phases"]["bar"]["count"])
+        self.assertEqual(
+            {"foo", "bar"}, set(data["operations"]["op1"]["phases"])
+        )
+
+    def test_merge_and_top(self):
+        profiler = profiling.enable()
+        for name in ["op1", "op2", "op3"]:
+            with profiler.operation(name):
+                pass
+        other = profiling.Profiler()
+        with other.operation("op4"), other.phase("foo"):
+            pass
+        profiler.merge(other.get_data())
+        data = profiler.get_data(top=2)
+        self.assertEqual(4, len(data["operations"]))
+        self.assertEqual(2, len(data["slowest_operations"]))
+        self.assertEqual(1, data["phases"]["foo"]["count"])
+        self.assertIn("foo", data["operations"]["op4"]["phases"])
+        self.assertIn("Slowest operations", profiler.format_table(top=2))
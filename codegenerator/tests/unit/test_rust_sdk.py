@@ -205,3 +205,108 @@ pub struct Request<'a> {
             "".join([x.rstrip() for x in expected_root_render.split()]),
             "".join([x.rstrip() for x in content.split()]),
         )
+
+    def test_set_models_name_collisions(self):
+        links = {"type": "object", "properties": {"href": {"type": "string"}}}
+        schema = {
+            "type": "object",
+            "properties": {
+                name: {
+                    "type": "object",
+                    "properties": {
+                        "serverOptions": {
+                            "type": "object",
+                            "properties": {"a": {"type": "string"}},
+                        },
+                        "server_options": {
+                            "type": "object",
+                            "properties": {"b": {"type": "string"}},
+                        },
+                        "links": links,
+                    },
+                }
+                for name in ["foo", "bar"]
+            },
+        }
+        (_, models) = model.OpenAPISchemaParser().parse(schema)
+        type_manager = rust_sdk.TypeManager()
+        type_manager.set_models(models)
+        # Identical `links` of the second parent is discarded
+        self.assertEqual(
+            ["Links"],
+            [x.name for x in type_manager.get_subtypes() if x.name == "Links"],
+        )
+        # Renamed references are still resolved
+        self.assertTrue(type_manager.renamed_refs)
+        for ref in type_manager.renamed_refs:
+            self.assertIs(
+                ref, type_manager._get_adt_by_reference(ref).reference
+            )
+
+    def test_set_models_conversion_cache(self):
+        conversion_cache = common_rust.ConversionCache()
+        results = []
+        for _ in range(2):
+            (_, models) = model.OpenAPISchemaParser().parse(
+                test_model.SAMPLE_SERVER_SCHEMA
+            )
+            type_manager = rust_sdk.TypeManager(
+                conversion_cache=conversion_cache
+            )
+            type_manager.set_models(models)
+            results.append(type_manager)
+        self.assertEqual(len(models), conversion_cache.converted)
+        self.assertEqual(len(models), conversion_cache.reused)
+        self.assertEqual(list(results[0].refs), list(results[1].refs))
+        self.assertEqual(
+            list(results[0].refs.values()), list(results[1].refs.values())
+        )
+        # Every type manager gets own copy of the converted types
+        root = results[1].get_root_data_type()
+        self.assertIsNot(results[0].get_root_data_type(), root)
+        root.fields.clear()
+        self.assertTrue(results[0].get_root_data_type().fields)
+
+    def test_set_models_conversion_cache_set_order(self):
+        """Models with the differently ordered sets do not share the entry"""
+        conversion_cache = common_rust.ConversionCache()
+        roots = [
+            model.Enum(literals=literals, base_types=[model.ConstraintInteger])
+            for literals in ([1, 9], [9, 1])
+        ]
+        # 1 and 9 collide in the set and keep the insertion order
+        self.assertNotEqual(list(roots[0].literals), list(roots[1].literals))
+        for root in roots:
+            type_manager = rust_sdk.TypeManager(
+                conversion_cache=conversion_cache
+            )
+            type_manager.set_models([root])
+        self.assertEqual(2, conversion_cache.converted)
+        self.assertEqual(0, conversion_cache.reused)
+
+    def test_set_models_conversion_cache_enum_order(self):
+        """Cached enum variants are rendered in the order of the model"""
+        conversion_cache = common_rust.ConversionCache()
+        schemas = [
+            {"type": "string", "enum": literals}
+            for literals in (["a", "b", "c"], ["c", "b", "a"]) * 2
+        ]
+        for schema in schemas:
+            (_, models) = model.OpenAPISchemaParser().parse(
+                {"type": "object", "properties": {"foo": schema}}
+            )
+            results = []
+            for cache in (conversion_cache, None):
+                type_manager = rust_sdk.TypeManager(conversion_cache=cache)
+                type_manager.set_models(models)
+                results.append(
+                    [
+                        list(x.variants)
+                        for x in type_manager.refs.values()
+                        if isinstance(x, common_rust.StringEnum)
+                    ]
+                )
+            self.assertEqual(results[1], results[0])
+        # Second pair is taken from the cache
+        self.assertEqual(2 * len(models), conversion_cache.converted)
+        self.assertEqual(2 * len(models), conversion_cache.reused)
@@ -0,0 +1,88 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+import argparse
+import io
+import json
+import logging
+from unittest import mock
+from unittest import TestCase
+
+from codegenerator import cli
+from codegenerator import server
+
+
+class TestGeneratorServer(TestCase):
+    def setUp(self):
+        super().setUp()
+        args = argparse.Namespace(
+            **{name: None for name in server.REQUEST_ARGS},
+            target=["rust-sdk"],
+            cache_dir=None,
+        )
+        self.server = server.GeneratorServer(args, cli.Generator(), {})
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def test_serve_stream(self):
+        requests = [
+            {"id": 1, "command": "ping"},
+            {"id": 2, "bogus": "x"},
+            {"id": 3},
+            {"id": 4, "command": "shutdown"},
+            {"id": 5, "command": "ping"},
+        ]
+        infile = io.StringIO(
+            "\n".join(json.dumps(x) for x in requests) + "\nnot json\n"
+        )
+        outfile = io.StringIO()
+        self.server.serve_stream(infile, outfile)
+        responses = [json.loads(x) for x in outfile.getvalue().splitlines()]
+        self.assertEqual(
+            [
+                {"id": 1, "status": "ok"},
+                {
+                    "id": 2,
+                    "status": "error",
+                    "error": "Unsupported request fields: bogus",
+                },
+                {
+                    "id": 3,
+                    "status": "error",
+                    "error": "Either metadata or metadata_dir is required",
+                },
+                {"id": 4, "status": "ok"},
+            ],
+            responses,
+        )
+        self.assertFalse(self.server.running)
+
+    @mock.patch.object(cli, "get_requested_metadata_files", return_value={})
+    @mock.patch.object(cli, "generate_metadata")
+    def test_generation_cache_kept(self, generate_metadata, _):
+        for _ in range(2):
+            response = self.server.handle(
+                {"metadata": "compute_metadata.yaml"}
+            )
+            self.assertEqual(
+                {"rust-sdk": {"hits": 0, "misses": 0}}, response["cache"]
+            )
+        # Same in-memory caches are used by all requests
+        self.assertEqual(2, generate_metadata.call_count)
+        for call in generate_metadata.call_args_list:
+            self.assertIs(self.server.caches, call.args[4])
+
+    def test_invalid_request(self):
+        self.assertIsNone(self.server.handle_line("  \n"))
+        response = self.server.handle_line("[1]")
+        assert response is not None
+        self.assertEqual("error", json.loads(response)["status"])
@@ -0,0 +1,156 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+from pathlib import Path
+import sys
+import tempfile
+from unittest import mock
+from unittest import TestCase
+
+import yaml
+
+from codegenerator import cache
+from codegenerator import cli
+from codegenerator import watch
+
+SPEC_FILE = Path(
+    cache.PACKAGE_DIR.parent,
+    "static",
+    "openapi_specs",
+    "object-store",
+    "v1.yaml",
+)
+
+
+def get_metadata(operations: dict[str, str]) -> dict:
+    return {
+        "resources": {
+            "object-store.account": {
+                "spec_file": SPEC_FILE.as_posix(),
+                "api_version": "v1",
+                "operations": {
+                    name: {
+                        "operation_id": operation_id,
+                        "operation_type": name,
+                        "targets": {
+                            "rust-sdk": {"module_name": name},
+                            "rust-cli": {
+                                "module_name": name,
+                                "sdk_mod_name": name,
+                                "cli_full_command": f"account {name}",
+                            },
+                        },
+                    }
+                    for name, operation_id in operations.items()
+                },
+            }
+        }
+    }
+
+
+class TestWatcher(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.metadata = Path(self.tmp.name, "object-store_metadata.yaml")
+        self.write_metadata({"get": "account.get", "delete": "account.delete"})
+        argv = [
+            "openstack-codegenerator",
+            "--work-dir",
+            Path(self.tmp.name, "wrk").as_posix(),
+            "--target",
+            "rust-sdk",
+            "rust-cli",
+            "--metadata",
+            self.metadata.as_posix(),
+            "--service",
+            "object-store",
+            "--format-mode",
+            "none",
+            "--watch",
+        ]
+        with (
+            mock.patch.object(sys, "argv", argv),
+            mock.patch("logging.basicConfig"),
+            mock.patch.object(cli, "run") as run,
+        ):
+            cli.main()
+        (args, code_generators) = run.call_args.args
+        for code_generator in code_generators.values():
+            cli.configure_code_generator(code_generator, args)
+        self.watcher = watch.Watcher(
+            args, cli.get_generator(args), code_generators
+        )
+
+    def write_metadata(self, operations: dict[str, str]):
+        self.metadata.write_text(yaml.safe_dump(get_metadata(operations)))
+
+    def generate(self, changed: list[Path]) -> list[tuple[str, str]]:
+        """Generate and return rendered (operation_id, target)"""
+        with mock.patch.object(
+            cli, "generate_operation", wraps=cli.generate_operation
+        ) as generate_operation:
+            self.watcher.generate(changed)
+        return sorted(
+            (call.args[5], target)
+            for call in generate_operation.call_args_list
+            for (target, _) in call.args[6]
+        )
+
+    def test_generate_affected(self):
+        self.assertEqual(
+            [
+                ("account.delete", "rust-cli"),
+                ("account.delete", "rust-sdk"),
+                ("account.get", "rust-cli"),
+                ("account.get", "rust-sdk"),
+            ],
+            self.generate([]),
+        )
+        # Nothing changed: operations are not even looked up in the cache
+        self.assertEqual([], self.generate([]))
+        self.assertEqual(
+            [(0, 0), (0, 0)],
+            [(x.hits, x.misses) for x in self.watcher.caches.values()],
+        )
+        # Template used only by the CLI
+        template = "rust_cli/impl.rs.j2"
+        get_template_hash = cache.GenerationCache.get_template_hash
+        with mock.patch.object(
+            cache.GenerationCache,
+            "get_template_hash",
+            lambda self, name: (
+                "modified"
+                if name == template
+                else get_template_hash(self, name)
+            ),
+        ):
+            self.assertEqual(
+                [("account.delete", "rust-cli"), ("account.get", "rust-cli")],
+                self.generate([Path(cache.TEMPLATES_DIR, template).resolve()]),
+            )
+        self.assertEqual(
+            {"rust-sdk": (0, 0), "rust-cli": (0, 2)},
+            {
+                target: (x.hits, x.misses)
+                for target, x in self.watcher.caches.items()
+            },
+        )
+        # Metadata entry of a single operation changed
+        self.write_metadata({"get": "account.get", "delete": "account.head"})
+        self.assertEqual(
+            [("account.head", "rust-cli"), ("account.head", "rust-sdk")],
+            self.generate([self.metadata.resolve()]),
+        )
+        # Spec file changed, but not the resolved operations
+        self.assertEqual([], self.generate([SPEC_FILE.resolve()]))
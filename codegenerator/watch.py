@@ -0,0 +1,134 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Regeneration of the operations affected by the modified inputs
+
+Every generated operation depends on the resolved spec of the operation, its
+metadata entry and the templates rendered for it. These dependencies are
+recorded after every run (see `cli.OperationGraph`). Once any of the watched
+files is modified only the operations depending on it are generated again
+while the rest is taken over from the previous run. Operations which are
+generated again still use the generation cache (i.e. when only an unrelated
+part of the spec file changed).
+"""
+
+import argparse
+import logging
+from pathlib import Path
+import time
+from typing import Iterable
+
+from codegenerator import cache
+from codegenerator import cli
+from codegenerator.base import BaseGenerator
+
+
+class Watcher:
+    """Watcher of the specs, metadata and templates"""
+
+    #: Interval of polling for modifications (seconds)
+    interval: float = 1.0
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        generator: cli.Generator,
+        code_generators: dict[str, BaseGenerator],
+    ):
+        self.args = args
+        self.generator = generator
+        self.code_generators = code_generators
+        #: Generation caches kept between the runs
+        self.caches = {
+            target: cache.GenerationCache(
+                Path(args.cache_dir, f"generate_{target}.json")
+                if args.cache_dir
+                else None
+            )
+            for target in args.target
+        }
+        #: Dependencies of the operations generated by the previous run
+        self.graph = cli.OperationGraph()
+
+    def get_watched_files(self) -> list[Path]:
+        """Get metadata, loaded specs and templates"""
+        paths = list(cli.get_requested_metadata_files(self.args).values())
+        paths.extend(Path(x) for x in self.generator.mtimes)
+        paths.extend(x for x in cache.TEMPLATES_DIR.rglob("*") if x.is_file())
+        return paths
+
+    def get_mtimes(self) -> dict[Path, int]:
+        """Get modification time of the watched files"""
+        mtimes = {}
+        for path in self.get_watched_files():
+            try:
+                mtimes[path.resolve()] = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def generate(self, changed: Iterable[Path] = ()):
+        """Generate operations affected by the modifications
+
+        :param changed: Resolved paths of the modified files. Paths of the
+            failed run are kept until the generation succeeds.
+        """
+        self.graph.changed.update(changed)
+        for path in self.generator.drop_changed():
+            logging.info("Reloading modified %s", path)
+        cli.reset_code_generators(self.code_generators)
+        for generation_cache in self.caches.values():
+            generation_cache.hits = generation_cache.misses = 0
+        cli.generate_metadata(
+            self.args,
+            self.generator,
+            self.code_generators,
+            cli.get_requested_metadata_files(self.args),
+            self.caches,
+            self.graph,
+        )
+        self.graph.changed = set()
+
+    def watch(self):
+        """Generate and keep regenerating on modifications until interrupted"""
+        mtimes: dict[Path, int] = {}
+        try:
+            while True:
+                current = self.get_mtimes()
+                changed = sorted(
+                    path
+                    for path in current.keys() | mtimes.keys()
+                    if current.get(path) != mtimes.get(path)
+                )
+                if mtimes and changed:
+                    logging.info(
+                        "Modified: %s",
+                        ", ".join(x.as_posix() for x in changed),
+                    )
+                if changed:
+                    try:
+                        self.generate(changed)
+                    except Exception:
+                        logging.exception("Generation failed")
+                    # Specs loaded by the run are watched with the
+                    # modification time they had when being loaded
+                    mtimes = {
+                        **{
+                            Path(x).resolve(): y
+                            for x, y in self.generator.mtimes.items()
+                        },
+                        **current,
+                    }
+                    logging.info("Watching for modifications")
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
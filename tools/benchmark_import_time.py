@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Import time benchmark of the `codegenerator.cli`
+
+Module is imported in a fresh interpreter with `-X importtime` (best of
+several runs is taken) and the cumulative import time is compared with the
+threshold. Heavy dependencies which must only be imported by the selected
+targets are checked not to be imported at all. Exits with non-zero code on
+regression.
+"""
+
+import argparse
+import subprocess
+import sys
+
+#: Modules which must not be imported by the `codegenerator.cli` itself
+FORBIDDEN_MODULES = [
+    "openstack",
+    "sphinx",
+    "openapi_core",
+    "mdformat",
+    "jinja2",
+    "codegenerator.rust_sdk",
+    "codegenerator.rust_cli",
+    "codegenerator.openapi_spec",
+]
+
+
+def measure(module: str) -> tuple[float, dict[str, int]]:
+    """Import module in a fresh interpreter
+
+    :returns: cumulative import time of the module in ms and cumulative
+        import times (us) of all imported modules
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            # header line
+            continue
+        modules[parts[2].strip()] = cumulative
+    return (modules[module] / 1000, modules)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="codegenerator.cli")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Number of the measurements"
+    )
+    parser.add_argument(
+        "--threshold-ms",
+        type=float,
+        default=800,
+        help="Maximal allowed cumulative import time",
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of the slowest imports"
+    )
+    args = parser.parse_args()
+
+    results = [measure(args.module) for _ in range(args.runs)]
+    (best, modules) = min(results, key=lambda x: x[0])
+    print(f"{args.module}: {best:.1f} ms (best of {args.runs})")
+    top_level = {
+        name: elapsed
+        for name, elapsed in modules.items()
+        if "." not in name and name != args.module
+    }
+    for name, elapsed in sorted(
+        top_level.items(), key=lambda x: x[1], reverse=True
+    )[: args.top]:
+        print(f"  {name:<40} {elapsed / 1000:>8.1f} ms")
+
+    failed = False
+    forbidden = [x for x in FORBIDDEN_MODULES if x in modules]
+    if forbidden:
+        print(f"Heavy modules are imported eagerly: {', '.join(forbidden)}")
+        failed = True
+    if best > args.threshold_ms:
+        print(f"Import time exceeds the threshold of {args.threshold_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
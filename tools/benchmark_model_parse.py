@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Schema parsing throughput benchmark of the `codegenerator.model`
+
+Request bodies, responses and parameters of all operations of the OpenAPI
+spec (i.e. `openapi_specs/compute/v2.yaml`) are parsed into the internal
+data model without the parse cache. Best of several runs is reported
+together with the memory retained by the parsed models.
+"""
+
+import argparse
+import pickle
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from codegenerator import common
+from codegenerator import model
+
+
+def get_schemas(spec: common.OpenAPISpec) -> tuple[list, list]:
+    """Get schemas and parameters of all operations
+
+    :returns: (schemas, parameters)
+    """
+    schemas: list[dict[str, Any]] = []
+    parameters: list[dict[str, Any]] = []
+    for _, _, operation in spec.operations.values():
+        parameters.extend(operation.get("parameters", []))
+        bodies = [operation.get("requestBody", {})]
+        bodies.extend(operation.get("responses", {}).values())
+        for body in bodies:
+            for content in body.get("content", {}).values():
+                if "schema" in content:
+                    schemas.append(content["schema"])
+    return (schemas, parameters)
+
+
+def parse_all(schemas: list, parameters: list) -> list:
+    """Parse all schemas and parameters
+
+    :returns: Parsed models
+    """
+    parser = model.OpenAPISchemaParser()
+    results: list = []
+    for schema in schemas:
+        results.append(parser.parse(schema))
+        results.append(parser.parse(schema, ignore_read_only=True))
+    for parameter in parameters:
+        results.append(parser.parse_parameter(parameter))
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("spec", help="Path to the OpenAPI spec")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Number of the measurements"
+    )
+    args = parser.parse_args()
+
+    spec = common.get_openapi_spec(args.spec)
+    (schemas, parameters) = get_schemas(spec)
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        parse_all(schemas, parameters)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    count = 2 * len(schemas) + len(parameters)
+    print(
+        f"{args.spec}: {count} schemas in {best * 1000:.1f} ms "
+        f"({count / best:.0f} schemas/s, best of {args.runs})"
+    )
+
+    tracemalloc.start()
+    results = parse_all(schemas, parameters)
+    (retained, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  retained models: {retained / 1024:.0f} KiB")
+    print(f"  pickled models: {len(pickle.dumps(results)) / 1024:.0f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Name collision stress benchmark of the `common.rust.TypeManager`
+
+Synthetic body contains the given number of objects, every one of them with
+two nested structs of its own shape getting the same Rust name (renamed by
+the parent name) and an identical `links` struct (discarded as duplicate).
+Only the conversion of the parsed models into the Rust models is measured.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import Any
+
+from codegenerator import model
+from codegenerator import rust_sdk
+
+
+def get_schema(count: int) -> dict[str, Any]:
+    """Get body schema with `count` colliding nested structs"""
+    links = {
+        "type": "object",
+        "properties": {"href": {"type": "string"}, "rel": {"type": "string"}},
+    }
+    properties = {}
+    for i in range(count):
+        properties[f"item{i}"] = {
+            "type": "object",
+            "properties": {
+                # Both are named `ServerOptions` in Rust
+                "serverOptions": {
+                    "type": "object",
+                    "properties": {f"opt{i}": {"type": "string"}},
+                },
+                "server_options": {
+                    "type": "object",
+                    "properties": {f"opt{i}": {"type": "boolean"}},
+                },
+                "links": links,
+            },
+        }
+    return {"type": "object", "properties": properties}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--count",
+        type=int,
+        nargs="+",
+        default=[250, 500, 1000, 2000],
+        help="Numbers of the colliding structs",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Number of the measurements"
+    )
+    args = parser.parse_args()
+    # Parser and type manager log every collision
+    logging.disable(logging.ERROR)
+
+    for count in args.count:
+        schema = get_schema(count)
+        timings = []
+        for _ in range(args.runs):
+            # Conversion renames the references of the models
+            (_, models) = model.OpenAPISchemaParser().parse(schema)
+            type_manager = rust_sdk.TypeManager()
+            start = time.perf_counter()
+            type_manager.set_models(models)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(
+            f"{count} collisions: {len(models)} models in "
+            f"{best * 1000:.1f} ms ({len(type_manager.refs)} Rust types, "
+            f"best of {args.runs})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
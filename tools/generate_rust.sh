@@ -7,6 +7,11 @@ openstack-codegenerator --work-dir metadata --target metadata --openapi-yaml-spe
 openstack-codegenerator --work-dir metadata --target metadata --openapi-yaml-spec wrk/openapi_specs/network/v2.yaml --service-type network
 openstack-codegenerator --work-dir metadata --target metadata --openapi-yaml-spec wrk/openapi_specs/load-balancer/v2.yaml --service-type load-balancer
 
+# Generate code of all services in a single run and only copy the selected
+# resources with the per service scripts
+openstack-codegenerator --work-dir wrk --target rust-sdk rust-cli --metadata-dir metadata --service block-storage,compute,identity,image,network,load-balancer --jobs $(nproc)
+
+export SKIP_GENERATE=1
 tools/generate_rust_block_storage.sh
 tools/generate_rust_compute.sh
 tools/generate_rust_identity.sh
@@ -28,8 +28,11 @@ NET_RESOURCES=(
   "volume_transfer"
 )
 
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk --metadata ${METADATA}/block-storage_metadata.yaml --service block-storage
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-cli --metadata ${METADATA}/block-storage_metadata.yaml --service block-storage
+# Generation is skipped when the code has been already generated for all
+# services at once (see generate_rust.sh)
+if [ -z "${SKIP_GENERATE}" ]; then
+  openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk rust-cli --metadata ${METADATA}/block-storage_metadata.yaml --service block-storage
+fi
 
 
 for resource in "${NET_RESOURCES[@]}"; do
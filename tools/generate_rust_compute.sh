@@ -13,8 +13,11 @@ NET_RESOURCES=(
   "server"
 )
 
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk --metadata ${METADATA}/compute_metadata.yaml --service compute
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-cli --metadata ${METADATA}/compute_metadata.yaml --service compute
+# Generation is skipped when the code has been already generated for all
+# services at once (see generate_rust.sh)
+if [ -z "${SKIP_GENERATE}" ]; then
+  openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk rust-cli --metadata ${METADATA}/compute_metadata.yaml --service compute
+fi
 
 for resource in "${NET_RESOURCES[@]}"; do
   cp -av "${WRK_DIR}/rust/openstack_sdk/src/api/compute/v2/${resource}" ${DST}/openstack_sdk/src/api/compute/v2
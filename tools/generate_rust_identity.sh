@@ -18,8 +18,11 @@ NET_RESOURCES=(
   "user"
 )
 
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk --metadata ${METADATA}/identity_metadata.yaml --service identity
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-cli --metadata ${METADATA}/identity_metadata.yaml --service identity
+# Generation is skipped when the code has been already generated for all
+# services at once (see generate_rust.sh)
+if [ -z "${SKIP_GENERATE}" ]; then
+  openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk rust-cli --metadata ${METADATA}/identity_metadata.yaml --service identity
+fi
 
 
 for resource in "${NET_RESOURCES[@]}"; do
@@ -9,8 +9,11 @@ NET_RESOURCES=(
   "schema"
 )
 
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk --metadata ${METADATA}/image_metadata.yaml --service image
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-cli --metadata ${METADATA}/image_metadata.yaml --service image
+# Generation is skipped when the code has been already generated for all
+# services at once (see generate_rust.sh)
+if [ -z "${SKIP_GENERATE}" ]; then
+  openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk rust-cli --metadata ${METADATA}/image_metadata.yaml --service image
+fi
 
 for resource in "${NET_RESOURCES[@]}"; do
   cp -av "${WRK_DIR}/rust/openstack_sdk/src/api/image/v2/${resource}" ${DST}/openstack_sdk/src/api/image/v2
@@ -20,8 +20,11 @@ NET_RESOURCES=(
   "version"
 )
 
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk --metadata ${METADATA}/load-balancer_metadata.yaml --service load-balancer
-openstack-codegenerator --work-dir ${WRK_DIR} --target rust-cli --metadata ${METADATA}/load-balancer_metadata.yaml --service load-balancer
+# Generation is skipped when the code has been already generated for all
+# services at once (see generate_rust.sh)
+if [ -z "${SKIP_GENERATE}" ]; then
+  openstack-codegenerator --work-dir ${WRK_DIR} --target rust-sdk rust-cli --metadata ${METADATA}/load-balancer_metadata.yaml --service load-balancer
+fi
 
 
 for resource in "${NET_RESOURCES[@]}"; do